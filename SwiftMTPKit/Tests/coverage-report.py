@@ -18,163 +18,45 @@ Requirements:
 
 import argparse
 import json
+import operator
 import os
 import re
 import sys
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from enum import Enum
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
+# Optional orjson support. Its C encoder is several times faster than the
+# pure-Python indent path of stdlib json on large reports; fall back to
+# stdlib json when it is not installed.
+try:
+    import orjson as _orjson_mod
 
-class CoverageStatus(Enum):
-    COVERED = "covered"
-    UNCOVERED = "uncovered"
-    PARTIAL = "partial"
-    IGNORED = "ignored"
+    def _write_json(obj: Any, output_path: str) -> None:
+        with open(output_path, 'wb') as f:
+            f.write(_orjson_mod.dumps(obj, option=_orjson_mod.OPT_INDENT_2))
 
+except ImportError:
+    _orjson_mod = None
 
-@dataclass
-class FunctionCoverage:
-    name: str
-    line_start: int
-    line_end: int
-    covered_lines: List[int] = field(default_factory=list)
-    uncovered_lines: List[int] = field(default_factory=list)
-    
-    @property
-    def coverage_percentage(self) -> float:
-        total = len(self.covered_lines) + len(self.uncovered_lines)
-        if total == 0:
-            return 100.0
-        return (len(self.covered_lines) / total) * 100
-
-
-@dataclass
-class FileCoverage:
-    path: str
-    functions: List[FunctionCoverage] = field(default_factory=list)
-    covered_lines: List[int] = field(default_factory=list)
-    uncovered_lines: List[int] = field(default_factory=list)
-    ignored_lines: List[int] = field(default_factory=list)
-    
-    @property
-    def total_lines(self) -> int:
-        return len(self.covered_lines) + len(self.uncovered_lines)
-    
-    @property
-    def coverage_percentage(self) -> float:
-        total = self.total_lines
-        if total == 0:
-            return 100.0
-        return (len(self.covered_lines) / total) * 100
-
-
-class SwiftCoverageParser:
-    """Parser for Swift LLVM coverage output formats."""
-    
-    # Regex patterns for llvm-cov text output
-    LINE_PATTERN = re.compile(
-        r'^\s*(\d+)\s+\|?\s*([^\n]*)$'
-    )
-    
-    FUNCTION_PATTERN = re.compile(
-        r'^Function: (\w+)\s+\((\d+)\.\.(\d+)\)$'
-    )
-    
-    BRANCH_PATTERN = re.compile(
-        r'^Branch\s+(\d+):\s+(Taken|Not Taken)$'
-    )
-    
-    @staticmethod
-    def parse_llvm_cov_text(output: str) -> Dict[str, FileCoverage]:
-        """Parse llvm-cov text output into FileCoverage objects."""
-        files: Dict[str, FileCoverage] = {}
-        current_file: Optional[FileCoverage] = None
-        current_function: Optional[FunctionCoverage] = None
-        
-        lines = output.split('\n')
-        i = 0
-        
-        while i < len(lines):
-            line = lines[i]
-            
-            # Check for file header
-            if line.startswith('Source Files in'):
-                # Skip source files list
-                i += 1
-                continue
-            
-            # Check for function marker
-            if line.startswith('Function: '):
-                match = re.match(r'Function: (\w+)\s+\((\d+)\.\.(\d+)\)', line)
-                if match and current_file:
-                    current_function = FunctionCoverage(
-                        name=match.group(1),
-                        line_start=int(match.group(2)),
-                        line_end=int(match.group(3))
-                    )
-                    current_file.functions.append(current_function)
-                i += 1
-                continue
-            
-            # Check for file path header
-            if line.startswith('/') or line.startswith('./'):
-                file_path = line.strip()
-                if file_path not in files:
-                    files[file_path] = FileCoverage(path=file_path)
-                current_file = files[file_path]
-                i += 1
-                continue
-            
-            # Parse line coverage data
-            match = re.match(r'^\s*(\d+)\s+\|?\s*([^\n]*)$', line)
-            if match and current_file:
-                line_num = int(match.group(1))
-                code = match.group(2).strip()
-                
-                # Skip empty lines and markers
-                if not code or code.startswith('//') or 'swiftcoverage:ignore' in code:
-                    if code and 'swiftcoverage:ignore' in code:
-                        current_file.ignored_lines.append(line_num)
-                    continue
-                
-                # Check coverage indicator (typically at start of line)
-                if line.startswith('     ') or line.startswith('      '):
-                    # Uncovered line
-                    current_file.uncovered_lines.append(line_num)
-                    if current_function:
-                        current_function.uncovered_lines.append(line_num)
-                else:
-                    # Covered line
-                    current_file.covered_lines.append(line_num)
-                    if current_function:
-                        current_function.covered_lines.append(line_num)
-            
-            i += 1
-        
-        return files
+    def _write_json(obj: Any, output_path: str) -> None:
+        with open(output_path, 'w') as f:
+            json.dump(obj, f, indent=2)
 
 
-class CoverageReportGenerator:
-    """Generates coverage reports in various formats."""
-    
-    def __init__(self, files: Dict[str, FileCoverage]):
-        self.files = files
-        self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    def generate_html_report(self, output_path: str) -> None:
-        """Generate an HTML coverage report with color-coded visualization."""
-        
-        html_content = f"""<!DOCTYPE html>
+# Static parts of the HTML report, written around the streamed table rows
+# and per-file sections so the full document is never held in memory.
+_HTML_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>SwiftMTP Coverage Report</title>
     <style>
-        :root {{
+        :root {
             --covered-color: #28a745;
             --uncovered-color: #dc3545;
             --partial-color: #ffc107;
@@ -183,230 +65,232 @@ class CoverageReportGenerator:
             --card-bg: #ffffff;
             --text-color: #212529;
             --border-color: #dee2e6;
-        }}
+        }
         
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
             background: var(--bg-color);
             color: var(--text-color);
             margin: 0;
             padding: 20px;
-        }}
+        }
         
-        .container {{
+        .container {
             max-width: 1400px;
             margin: 0 auto;
-        }}
+        }
         
-        header {{
+        header {
             background: var(--card-bg);
             padding: 20px;
             border-radius: 8px;
             margin-bottom: 20px;
             box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-        }}
+        }
         
-        h1 {{
+        h1 {
             margin: 0 0 10px 0;
             color: var(--text-color);
-        }}
+        }
         
-        .meta {{
+        .meta {
             color: #6c757d;
             font-size: 0.9em;
-        }}
+        }
         
-        .summary-cards {{
+        .summary-cards {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
             gap: 15px;
             margin-bottom: 20px;
-        }}
+        }
         
-        .card {{
+        .card {
             background: var(--card-bg);
             padding: 20px;
             border-radius: 8px;
             box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-        }}
+        }
         
-        .card-title {{
+        .card-title {
             font-size: 0.85em;
             text-transform: uppercase;
             color: #6c757d;
             margin-bottom: 5px;
-        }}
+        }
         
-        .card-value {{
+        .card-value {
             font-size: 2em;
             font-weight: bold;
-        }}
+        }
         
-        .card-value.good {{ color: var(--covered-color); }}
-        .card-value.warning {{ color: var(--partial-color); }}
-        .card-value.bad {{ color: var(--uncovered-color); }}
+        .card-value.good { color: var(--covered-color); }
+        .card-value.warning { color: var(--partial-color); }
+        .card-value.bad { color: var(--uncovered-color); }
         
-        table {{
+        table {
             width: 100%;
             border-collapse: collapse;
             background: var(--card-bg);
             border-radius: 8px;
             overflow: hidden;
             box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-        }}
+        }
         
-        th, td {{
+        th, td {
             padding: 12px 15px;
             text-align: left;
             border-bottom: 1px solid var(--border-color);
-        }}
+        }
         
-        th {{
+        th {
             background: #f8f9fa;
             font-weight: 600;
             text-transform: uppercase;
             font-size: 0.8em;
             letter-spacing: 0.5px;
-        }}
+        }
         
-        tr:hover {{ background: #f8f9fa; }}
+        tr:hover { background: #f8f9fa; }
         
-        .coverage-bar {{
+        .coverage-bar {
             width: 100%;
             height: 20px;
             background: #e9ecef;
             border-radius: 10px;
             overflow: hidden;
-        }}
+        }
         
-        .coverage-fill {{
+        .coverage-fill {
             height: 100%;
             border-radius: 10px;
             transition: width 0.3s ease;
-        }}
+        }
         
-        .coverage-fill.good {{ background: var(--covered-color); }}
-        .coverage-fill.warning {{ background: var(--partial-color); }}
-        .coverage-fill.bad {{ background: var(--uncovered-color); }}
+        .coverage-fill.good { background: var(--covered-color); }
+        .coverage-fill.warning { background: var(--partial-color); }
+        .coverage-fill.bad { background: var(--uncovered-color); }
         
-        .file-section {{
+        .file-section {
             background: var(--card-bg);
             border-radius: 8px;
             margin-bottom: 20px;
             box-shadow: 0 1px 3px rgba(0,0,0,0.1);
             overflow: hidden;
-        }}
+        }
         
-        .file-header {{
+        .file-header {
             padding: 15px 20px;
             background: #f8f9fa;
             border-bottom: 1px solid var(--border-color);
             cursor: pointer;
-        }}
+        }
         
-        .file-header:hover {{ background: #e9ecef; }}
+        .file-header:hover { background: #e9ecef; }
         
-        .file-content {{
+        .file-content {
             display: none;
             padding: 20px;
-        }}
+        }
         
-        .file-content.expanded {{ display: block; }}
+        .file-content.expanded { display: block; }
         
-        .line-numbers {{
+        .line-numbers {
             font-family: 'SF Mono', Monaco, 'Courier New', monospace;
             font-size: 13px;
             line-height: 1.6;
             white-space: pre;
             overflow-x: auto;
-        }}
+        }
         
-        .line-covered {{
+        .line-covered {
             background: rgba(40, 167, 69, 0.15);
             display: inline-block;
             width: 100%;
-        }}
+        }
         
-        .line-uncovered {{
+        .line-uncovered {
             background: rgba(220, 53, 69, 0.15);
             display: inline-block;
             width: 100%;
-        }}
+        }
         
-        .line-number {{
+        .line-number {
             display: inline-block;
-            width: 50px;
+            width: 110px;
             color: #6c757d;
             user-select: none;
-        }}
+        }
         
-        .line-code {{
+        .line-code {
             color: var(--text-color);
-        }}
+        }
         
-        .legend {{
+        .legend {
             display: flex;
             gap: 20px;
             margin-bottom: 20px;
             flex-wrap: wrap;
-        }}
+        }
         
-        .legend-item {{
+        .legend-item {
             display: flex;
             align-items: center;
             gap: 8px;
-        }}
+        }
         
-        .legend-color {{
+        .legend-color {
             width: 16px;
             height: 16px;
             border-radius: 4px;
-        }}
+        }
         
-        .search-box {{
+        .search-box {
             padding: 10px 15px;
             border: 1px solid var(--border-color);
             border-radius: 6px;
             font-size: 14px;
             width: 300px;
             margin-bottom: 20px;
-        }}
+        }
         
-        .badge {{
+        .badge {
             display: inline-block;
             padding: 2px 8px;
             border-radius: 4px;
             font-size: 0.75em;
             font-weight: 600;
-        }}
+        }
         
-        .badge-good {{ background: rgba(40, 167, 69, 0.15); color: var(--covered-color); }}
-        .badge-bad {{ background: rgba(220, 53, 69, 0.15); color: var(--uncovered-color); }}
+        .badge-good { background: rgba(40, 167, 69, 0.15); color: var(--covered-color); }
+        .badge-bad { background: rgba(220, 53, 69, 0.15); color: var(--uncovered-color); }
     </style>
 </head>
 <body>
     <div class="container">
-        <header>
+"""
+
+_HTML_SUMMARY_TMPL = """        <header>
             <h1>📊 SwiftMTP Code Coverage Report</h1>
-            <div class="meta">Generated: {self.timestamp}</div>
+            <div class="meta">Generated: {timestamp}</div>{root_meta}
         </header>
         
         <div class="summary-cards">
             <div class="card">
                 <div class="card-title">Files Analyzed</div>
-                <div class="card-value">{len(self.files)}</div>
+                <div class="card-value">{total_files}</div>
             </div>
             <div class="card">
                 <div class="card-title">Total Lines</div>
-                <div class="card-value">{sum(f.total_lines for f in self.files.values())}</div>
+                <div class="card-value">{total_lines}</div>
             </div>
             <div class="card">
                 <div class="card-title">Coverage</div>
-                <div class="card-value {self._get_coverage_class(self.overall_coverage)}">{self.overall_coverage:.1f}%</div>
+                <div class="card-value {coverage_class}">{overall_coverage:.1f}%</div>
             </div>
             <div class="card">
                 <div class="card-title">Uncovered Lines</div>
-                <div class="card-value warning">{sum(len(f.uncovered_lines) for f in self.files.values())}</div>
+                <div class="card-value warning">{total_uncovered}</div>
             </div>
         </div>
         
@@ -438,37 +322,401 @@ class CoverageReportGenerator:
                 </tr>
             </thead>
             <tbody>
-                {self._generate_file_table_rows()}
-            </tbody>
+"""
+
+_HTML_TABLE_END = """            </tbody>
         </table>
         
-        {self._generate_file_details()}
-        
+"""
+
+_HTML_TAIL = """        
     </div>
     
     <script>
-        function toggleFile(id) {{
+        function toggleFile(id) {
             const content = document.getElementById(id);
             content.classList.toggle('expanded');
-        }}
+        }
         
-        document.getElementById('searchBox').addEventListener('input', function(e) {{
+        document.getElementById('searchBox').addEventListener('input', function(e) {
             const query = e.target.value.toLowerCase();
             const rows = document.querySelectorAll('tbody tr');
-            rows.forEach(row => {{
+            rows.forEach(row => {
                 const fileName = row.querySelector('td:first-child').textContent.toLowerCase();
                 row.style.display = fileName.includes(query) ? '' : 'none';
-            }});
-        }});
+            });
+        });
     </script>
 </body>
-</html>"""
+</html>
+"""
+
+
+# Per-file templates, filled with %-formatting once per table row/section
+# The name cell links to the file's detail section when it has one
+_FILE_LINK_TMPL = '<a href="#%s">%s</a>'
+
+_FILE_ROW_TMPL = """
+                <tr>
+                    <td>%s</td>
+                    <td>
+                        <div style="display: flex; align-items: center; gap: 10px;">
+                            <div style="width: 100px;">
+                                <div class="coverage-bar">
+                                    <div class="coverage-fill %s" style="width: %s%%"></div>
+                                </div>
+                            </div>
+                            <span>%.1f%%</span>
+                        </div>
+                    </td>
+                    <td>%d/%d</td>
+                    <td>%d</td>
+                    <td><span class="badge %s">%s</span></td>
+                </tr>
+            """
+
+_FILE_SECTION_TMPL = """
+            <div class="file-section" id="%s">
+                <div class="file-header" onclick="toggleFile('content-%s')">
+                    <strong>%s</strong> - %.1f%% coverage
+                    (%d/%d lines)
+                </div>
+                <div class="file-content" id="content-%s">
+                    <div class="line-numbers">
+                        %s
+                    </div>
+                </div>
+            </div>
+        """
+
+# Files with nothing uncovered get a header only; there are no lines to show
+_COLLAPSED_SECTION_TMPL = """
+            <div class="file-section" id="%s">
+                <div class="file-header">
+                    <strong>%s</strong> - %.1f%% coverage
+                    (%d/%d lines)
+                </div>
+            </div>
+        """
+
+# One entry per run of consecutive executable lines sharing a status; runs of
+# a single line use the plain per-line form
+_COVERED_LINE_TMPL = (
+    '<div class="line-covered">'
+    '<span class="line-number">%d</span>'
+    '<span class="line-code">// covered line</span>'
+    '</div>'
+)
+
+_UNCOVERED_LINE_TMPL = (
+    '<div class="line-uncovered">'
+    '<span class="line-number">%d</span>'
+    '<span class="line-code">// UNCOVERED</span>'
+    '</div>'
+)
+
+_COVERED_RUN_TMPL = (
+    '<div class="line-covered">'
+    '<span class="line-number">%d–%d</span>'
+    '<span class="line-code">// covered (%d lines)</span>'
+    '</div>'
+)
+
+_UNCOVERED_RUN_TMPL = (
+    '<div class="line-uncovered">'
+    '<span class="line-number">%d–%d</span>'
+    '<span class="line-code">// UNCOVERED (%d lines)</span>'
+    '</div>'
+)
+
+
+# CSS class per 10% coverage bucket: <60 bad, 60-79 warning, >=80 good
+_CLASS_BUCKETS = (
+    "bad", "bad", "bad", "bad", "bad", "bad",
+    "warning", "warning",
+    "good", "good", "good",
+)
+
+# (badge class, badge text, status icon) either side of the per-file threshold
+_BADGE_PASS = ("badge-good", "PASS", "✓")
+_BADGE_LOW = ("badge-bad", "LOW", "✗")
+
+
+@dataclass
+class FunctionCoverage:
+    name: str
+    line_start: int
+    line_end: int
+    covered_lines: Set[int] = field(default_factory=set)
+    uncovered_lines: Set[int] = field(default_factory=set)
+    
+    @property
+    def coverage_percentage(self) -> float:
+        total = len(self.covered_lines) + len(self.uncovered_lines)
+        if total == 0:
+            return 100.0
+        return (len(self.covered_lines) / total) * 100
+
+
+@dataclass
+class FileCoverage:
+    path: str
+    functions: List[FunctionCoverage] = field(default_factory=list)
+    covered_lines: Set[int] = field(default_factory=set)
+    uncovered_lines: Set[int] = field(default_factory=set)
+    ignored_lines: Set[int] = field(default_factory=set)
+    
+    @property
+    def total_lines(self) -> int:
+        return len(self.covered_lines) + len(self.uncovered_lines)
+    
+    @property
+    def coverage_percentage(self) -> float:
+        total = self.total_lines
+        if total == 0:
+            return 100.0
+        return (len(self.covered_lines) / total) * 100
+
+
+class _FileStats(NamedTuple):
+    """Per-file figures computed once and shared by every report format."""
+    file: FileCoverage
+    covered: int
+    total: int
+    coverage: float
+
+
+class SwiftCoverageParser:
+    """Parser for Swift LLVM coverage output formats."""
+    
+    # llvm-cov emits ASCII apart from source text and paths, so the parser
+    # works on bytes with ASCII-only character classes and decodes just the
+    # fields it keeps.
+    #
+    # Whole-buffer scanner: one alternation per line kind, sharing a single
+    # line anchor. Coverage data lines vastly outnumber headers, so that
+    # alternative is tried first. Whitespace classes exclude '\n' so no match
+    # can spill over into the following line. Function names may hold UTF-8
+    # (non-ASCII identifier) bytes. As in the original line-by-line parser,
+    # anything after a function's (start..end) range is ignored, including
+    # the '\r' that input read in binary mode keeps before the newline.
+    SCAN_PATTERN = re.compile(
+        rb'^(?:'
+        rb'(?P<line>[^\S\n]*(?P<line_num>\d+)[^\S\n]+\|?[^\S\n]*(?P<code>[^\n]*))'
+        rb'|(?P<function>Function: (?P<function_name>[\w\x80-\xff]+)[^\S\n]+'
+        rb'\((?P<line_start>\d+)\.\.(?P<line_end>\d+)\)[^\n]*)'
+        rb'|(?P<file>\.?/[^\n]*)'
+        rb')$',
+        re.MULTILINE | re.ASCII
+    )
+    
+    # Bytes read per block by parse_llvm_cov_stream
+    READ_BLOCK_SIZE = 1 << 20
+    
+    @classmethod
+    def parse_llvm_cov_text(cls, output: str) -> Dict[str, FileCoverage]:
+        """Parse llvm-cov text output into FileCoverage objects."""
+        return cls._parse_blocks((output.encode('utf-8'),))
+    
+    @classmethod
+    def parse_llvm_cov_stream(cls, stream: BinaryIO) -> Dict[str, FileCoverage]:
+        """Parse llvm-cov output from a binary file or pipe without reading it all into memory."""
+        return cls._parse_blocks(cls._read_line_blocks(stream, cls.READ_BLOCK_SIZE))
+    
+    @staticmethod
+    def _read_line_blocks(stream: BinaryIO, size: int) -> Iterator[bytes]:
+        """Yield blocks of roughly `size` bytes that end on a line boundary."""
+        pending = b''
+        while True:
+            chunk = stream.read(size)
+            if not chunk:
+                break
+            chunk = pending + chunk
+            cut = chunk.rfind(b'\n') + 1
+            pending = chunk[cut:]
+            if cut:
+                yield chunk[:cut]
+        if pending:
+            yield pending
+    
+    @classmethod
+    def _parse_blocks(cls, blocks: Iterable[bytes]) -> Dict[str, FileCoverage]:
+        """Parse llvm-cov output, given as whole-line blocks, into FileCoverage objects."""
+        files: Dict[str, FileCoverage] = {}
+        current_file: Optional[FileCoverage] = None
+        current_function: Optional[FunctionCoverage] = None
+        
+        for block in blocks:
+            # Ignore markers are rare; one search per block lets every line of
+            # a marker-free block skip the per-line substring test
+            block_has_ignores = b'swiftcoverage:ignore' in block
+            
+            # Lines matching no alternative (e.g. the "Source Files in" list) are
+            # skipped inside the regex engine without any per-line Python work.
+            for match in cls.SCAN_PATTERN.finditer(block):
+                kind = match.lastgroup
+                
+                # Parse line coverage data (the common case)
+                if kind == 'line':
+                    if not current_file:
+                        continue
+                    
+                    line_num = int(match.group('line_num'))
+                    code = match.group('code').strip()
+                    
+                    # Skip empty lines and markers
+                    ignored = block_has_ignores and b'swiftcoverage:ignore' in code
+                    if not code or ignored or code.startswith(b'//'):
+                        if ignored:
+                            # An ignored line never counts towards coverage, even
+                            # if the same line number was classified earlier
+                            current_file.ignored_lines.add(line_num)
+                            current_file.covered_lines.discard(line_num)
+                            current_file.uncovered_lines.discard(line_num)
+                            for function in current_file.functions:
+                                function.covered_lines.discard(line_num)
+                                function.uncovered_lines.discard(line_num)
+                        continue
+                    
+                    if line_num in current_file.ignored_lines:
+                        continue
+                    
+                    # Check coverage indicator (typically at start of line)
+                    if block.startswith(b'     ', match.start()):
+                        # Uncovered line
+                        current_file.uncovered_lines.add(line_num)
+                        if current_function:
+                            current_function.uncovered_lines.add(line_num)
+                    else:
+                        # Covered line
+                        current_file.covered_lines.add(line_num)
+                        if current_function:
+                            current_function.covered_lines.add(line_num)
+                
+                # Check for function marker
+                elif kind == 'function':
+                    if current_file:
+                        current_function = FunctionCoverage(
+                            name=match.group('function_name').decode('utf-8', 'replace'),
+                            line_start=int(match.group('line_start')),
+                            line_end=int(match.group('line_end'))
+                        )
+                        current_file.functions.append(current_function)
+                
+                # Check for file path header
+                else:
+                    file_path = match.group('file').strip().decode('utf-8', 'replace')
+                    if file_path not in files:
+                        files[file_path] = FileCoverage(path=file_path)
+                    current_file = files[file_path]
+        
+        return files
+
+
+class CoverageReportGenerator:
+    """Generates coverage reports in various formats."""
+    
+    def __init__(self, files: Dict[str, FileCoverage]):
+        self.files = files
+        self.timestamp = datetime.now().isoformat(sep=" ", timespec="seconds")
+        
+        # Project-wide line totals and per-file figures, gathered in one pass
+        # and shared by every report format instead of re-walking all files
+        # (and re-deriving each percentage) per figure.
+        self._total_covered = 0
+        self._total_uncovered = 0
+        self._total_ignored = 0
+        file_stats = []
+        for file in files.values():
+            covered = len(file.covered_lines)
+            uncovered = len(file.uncovered_lines)
+            self._total_covered += covered
+            self._total_uncovered += uncovered
+            self._total_ignored += len(file.ignored_lines)
+            file_stats.append(
+                _FileStats(file, covered, covered + uncovered, file.coverage_percentage)
+            )
+        self._total_lines = self._total_covered + self._total_uncovered
+        
+        # Files ordered by coverage, best first; shared by the HTML table,
+        # the per-file details and the text summary.
+        file_stats.sort(key=operator.attrgetter('coverage'), reverse=True)
+        self._sorted_stats = file_stats
+        
+        # Common directory of all files. It is shown once in the report header
+        # and per-file output uses paths relative to it, which keeps long
+        # absolute paths from being repeated for every file.
+        # With no root, paths are shown in full; otherwise every path starts
+        # with root + os.sep, so os.path.join(root, path) is the file again.
+        self._root = self._common_root(files)
+        strip = len(self._root) + 1 if self._root else 0
+        self._display_paths = {file.path: file.path[strip:] for file in files.values()}
+        
+        # Values for the HTML summary template, filled in with one format_map
+        overall_coverage = self.overall_coverage
+        self._summary_values = {
+            "timestamp": self.timestamp,
+            "total_files": len(files),
+            "total_lines": self._total_lines,
+            "total_uncovered": self._total_uncovered,
+            "overall_coverage": overall_coverage,
+            "coverage_class": self._get_coverage_class(overall_coverage),
+            "root_meta": f'\n            <div class="meta">Root: {self._root}</div>' if self._root else "",
+        }
+        
+        # HTML element ids: the file's hex position in the sorted order. Short,
+        # and deterministic for a given input (unlike str hash(), which is
+        # randomized per process).
+        self._file_ids = {
+            stat.file.path: f"file-{i:x}"
+            for i, stat in enumerate(file_stats)
+        }
+    
+    @staticmethod
+    def _common_root(files: Dict[str, FileCoverage]) -> str:
+        """Return the deepest directory containing every file, or "" if none.
+        
+        The root is only used if it is a literal prefix of every raw path:
+        commonpath normalises components (``./Sources/A`` becomes
+        ``Sources``), and stripping such a root would misplace the files.
+        A filesystem root shared by unrelated trees counts as no root.
+        """
+        try:
+            root = os.path.commonpath([os.path.dirname(file.path) for file in files.values()])
+        except ValueError:
+            # No files, or a mix of absolute and relative paths
+            return ""
+        if not root or os.path.dirname(root) == root:
+            return ""
+        prefix = root + os.sep
+        if all(file.path.startswith(prefix) for file in files.values()):
+            return root
+        return ""
+    
+    def generate_html_report(
+        self, output_path: str, only_uncovered: bool = False, jobs: int = 1
+    ) -> None:
+        """Generate an HTML coverage report with color-coded visualization.
+        
+        With only_uncovered, detail sections are emitted only for files that
+        have uncovered lines. jobs > 1 renders the detail sections in that
+        many worker processes.
+        """
         
         with open(output_path, 'w') as f:
-            f.write(html_content)
+            f.write(_HTML_HEAD)
+            f.write(self._generate_html_summary())
+            f.writelines(self._generate_file_table_rows(only_uncovered))
+            f.write(_HTML_TABLE_END)
+            f.writelines(self._generate_file_details(only_uncovered, jobs))
+            f.write(_HTML_TAIL)
         
         print(f"HTML report generated: {output_path}")
     
+    def _generate_html_summary(self) -> str:
+        """Generate the HTML header, summary cards, legend and table head."""
+        return _HTML_SUMMARY_TMPL.format_map(self._summary_values)
+    
     def generate_json_report(self, output_path: str, threshold_overall: float = 75.0) -> None:
         """Generate JSON report for CI integration."""
         
@@ -476,19 +724,20 @@ class CoverageReportGenerator:
             "project": "SwiftMTPKit",
             "timestamp": self.timestamp,
             "version": os.environ.get("GITHUB_SHA", "unknown"),
+            "root": self._root,
             "summary": {
                 "total_files": len(self.files),
-                "total_lines": sum(f.total_lines for f in self.files.values()),
-                "covered_lines": sum(len(f.covered_lines) for f in self.files.values()),
-                "uncovered_lines": sum(len(f.uncovered_lines) for f in self.files.values()),
-                "ignored_lines": sum(len(f.ignored_lines) for f in self.files.values()),
+                "total_lines": self._total_lines,
+                "covered_lines": self._total_covered,
+                "uncovered_lines": self._total_uncovered,
+                "ignored_lines": self._total_ignored,
                 "overall_coverage": self.overall_coverage,
                 "threshold": threshold_overall,
                 "status": "pass" if self.overall_coverage >= threshold_overall else "fail"
             },
             "files": [
                 {
-                    "path": path,
+                    "path": self._display_paths[file.path],
                     "coverage_percentage": file.coverage_percentage,
                     "total_lines": file.total_lines,
                     "covered_lines": len(file.covered_lines),
@@ -504,7 +753,7 @@ class CoverageReportGenerator:
                         for func in file.functions
                     ]
                 }
-                for path, file in self.files.items()
+                for file in self.files.values()
             ],
             "thresholds": {
                 "overall": threshold_overall,
@@ -513,8 +762,7 @@ class CoverageReportGenerator:
             }
         }
         
-        with open(output_path, 'w') as f:
-            json.dump(report, f, indent=2)
+        _write_json(report, output_path)
         
         print(f"JSON report generated: {output_path}")
     
@@ -529,29 +777,22 @@ class CoverageReportGenerator:
             "",
             f"Overall Coverage: {self.overall_coverage:.1f}%",
             f"Total Files: {len(self.files)}",
-            f"Total Lines: {sum(f.total_lines for f in self.files.values())}",
-            f"Covered Lines: {sum(len(f.covered_lines) for f in self.files.values())}",
-            f"Uncovered Lines: {sum(len(f.uncovered_lines) for f in self.files.values())}",
+            f"Total Lines: {self._total_lines}",
+            f"Covered Lines: {self._total_covered}",
+            f"Uncovered Lines: {self._total_uncovered}",
             "",
             "-" * 60,
             "Per-File Coverage:",
             "-" * 60,
         ]
         
-        # Sort files by coverage percentage
-        sorted_files = sorted(
-            self.files.values(),
-            key=lambda f: f.coverage_percentage,
-            reverse=True
-        )
-        
-        for file in sorted_files:
-            coverage_class = self._get_coverage_class(file.coverage_percentage)
-            status_icon = "✓" if file.coverage_percentage >= 60 else "✗"
+        # Files are already sorted by coverage percentage
+        for file, covered, total, coverage in self._sorted_stats:
+            status_icon = self._get_badge(coverage)[2]
             
             lines.append(
-                f"{status_icon} {file.path}: {file.coverage_percentage:.1f}% "
-                f"({len(file.covered_lines)}/{file.total_lines} lines)"
+                f"{status_icon} {file.path}: {coverage:.1f}% "
+                f"({covered}/{total} lines)"
             )
         
         lines.extend([
@@ -561,7 +802,7 @@ class CoverageReportGenerator:
             "-" * 60,
         ])
         
-        low_coverage_files = [f for f in sorted_files if f.coverage_percentage < 60]
+        low_coverage_files = [stat.file for stat in self._sorted_stats if stat.coverage < 60]
         if low_coverage_files:
             for file in low_coverage_files:
                 lines.append(f"  ⚠ {file.path}")
@@ -585,101 +826,123 @@ class CoverageReportGenerator:
     @property
     def overall_coverage(self) -> float:
         """Calculate overall coverage percentage across all files."""
-        total_covered = sum(len(f.covered_lines) for f in self.files.values())
-        total_lines = sum(f.total_lines for f in self.files.values())
-        
-        if total_lines == 0:
+        if self._total_lines == 0:
             return 100.0
         
-        return (total_covered / total_lines) * 100
+        return (self._total_covered / self._total_lines) * 100
     
     def _get_coverage_class(self, coverage: float) -> str:
         """Get CSS class based on coverage percentage."""
-        if coverage >= 80:
-            return "good"
-        elif coverage >= 60:
-            return "warning"
-        else:
-            return "bad"
+        return _CLASS_BUCKETS[min(int(coverage // 10), 10)]
     
-    def _generate_file_table_rows(self) -> str:
-        """Generate HTML table rows for files."""
-        rows = []
-        
-        sorted_files = sorted(
-            self.files.values(),
-            key=lambda f: f.coverage_percentage,
-            reverse=True
-        )
-        
-        for file in sorted_files:
-            coverage_class = self._get_coverage_class(file.coverage_percentage)
-            coverage_width = min(100, file.coverage_percentage)
-            
-            status = "✓" if file.coverage_percentage >= 60 else "⚠"
-            badge_class = "badge-good" if file.coverage_percentage >= 60 else "badge-bad"
-            badge_text = "PASS" if file.coverage_percentage >= 60 else "LOW"
-            
-            rows.append(f"""
-                <tr>
-                    <td><a href="#file-{hash(file.path)}">{file.path}</a></td>
-                    <td>
-                        <div style="display: flex; align-items: center; gap: 10px;">
-                            <div style="width: 100px;">
-                                <div class="coverage-bar">
-                                    <div class="coverage-fill {coverage_class}" style="width: {coverage_width}%"></div>
-                                </div>
-                            </div>
-                            <span>{file.coverage_percentage:.1f}%</span>
-                        </div>
-                    </td>
-                    <td>{len(file.covered_lines)}/{file.total_lines}</td>
-                    <td>{len(file.functions)}</td>
-                    <td><span class="badge {badge_class}">{badge_text}</span></td>
-                </tr>
-            """)
-        
-        return "\n".join(rows)
+    def _get_badge(self, coverage: float) -> Tuple[str, str, str]:
+        """Get (badge class, badge text, status icon) for a file's coverage."""
+        return _BADGE_PASS if coverage >= 60 else _BADGE_LOW
     
-    def _generate_file_details(self) -> str:
-        """Generate detailed sections for each file with line-by-line coverage."""
-        sections = []
-        
-        for path, file in self.files.items():
-            file_id = f"file-{hash(path)}"
+    def _generate_file_table_rows(self, only_uncovered: bool = False) -> Iterator[str]:
+        """Generate HTML table rows for files, one row at a time.
+        
+        With only_uncovered, fully covered files get no detail section, so
+        their names are rendered without a link.
+        """
+        for file, covered, total, coverage in self._sorted_stats:
+            coverage_class = self._get_coverage_class(coverage)
+            coverage_width = min(100, coverage)
             
-            lines_html = []
-            for i, line_num in enumerate(sorted(file.covered_lines + file.uncovered_lines)):
-                if line_num in file.covered_lines:
-                    lines_html.append(
-                        f'<div class="line-covered">'
-                        f'<span class="line-number">{line_num}</span>'
-                        f'<span class="line-code">// covered line</span>'
-                        f'</div>'
-                    )
-                else:
-                    lines_html.append(
-                        f'<div class="line-uncovered">'
-                        f'<span class="line-number">{line_num}</span>'
-                        f'<span class="line-code">// UNCOVERED</span>'
-                        f'</div>'
-                    )
+            badge_class, badge_text, _ = self._get_badge(coverage)
             
-            sections.append(f"""
-                <div class="file-section" id="{file_id}">
-                    <div class="file-header" onclick="toggleFile('content-{file_id}')">
-                        <strong>{path}</strong> - {file.coverage_percentage:.1f}% coverage
-                        ({len(file.covered_lines)}/{file.total_lines} lines)
-                    </div>
-                    <div class="file-content" id="content-{file_id}">
-                        <div class="line-numbers">
-                            {''.join(lines_html)}
-                        </div>
-                    </div>
-                </div>
-            """)
-        
-        return "\n".join(sections)
+            name = self._display_paths[file.path]
+            if file.uncovered_lines or not only_uncovered:
+                name = _FILE_LINK_TMPL % (self._file_ids[file.path], name)
+            
+            yield _FILE_ROW_TMPL % (
+                name,
+                coverage_class, coverage_width, coverage,
+                covered, total,
+                len(file.functions),
+                badge_class, badge_text,
+            )
+    
+    def _generate_file_details(self, only_uncovered: bool = False, jobs: int = 1) -> Iterator[str]:
+        """Generate detailed sections for each file with its line coverage runs.
+        
+        With jobs > 1 the sections are rendered in a process pool and still
+        yielded in table order.
+        """
+        stats = [
+            stat for stat in self._sorted_stats
+            if stat.file.uncovered_lines or not only_uncovered
+        ]
+        file_ids = [self._file_ids[stat.file.path] for stat in stats]
+        paths = [self._display_paths[stat.file.path] for stat in stats]
+        
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                yield from executor.map(
+                    _render_file_section, file_ids, paths, stats, chunksize=64
+                )
+        else:
+            yield from map(_render_file_section, file_ids, paths, stats)
+
+
+def _render_file_section(file_id: str, path: str, stat: _FileStats) -> str:
+    """Render one file's detail section with its line coverage runs.
+    
+    Module-level (and dependent only on its arguments) so that it can run in
+    a worker process.
+    """
+    file = stat.file
+    
+    # Fully covered: no runs worth expanding, skip the line walk
+    if not file.uncovered_lines:
+        return _COLLAPSED_SECTION_TMPL % (
+            file_id, path,
+            stat.coverage, stat.covered, stat.total,
+        )
+    
+    runs_html = []
+    for covered, start, end, count in _coverage_runs(file):
+        if count == 1:
+            runs_html.append((_COVERED_LINE_TMPL if covered else _UNCOVERED_LINE_TMPL) % start)
+        else:
+            runs_html.append(
+                (_COVERED_RUN_TMPL if covered else _UNCOVERED_RUN_TMPL) % (start, end, count)
+            )
+    
+    return _FILE_SECTION_TMPL % (
+        file_id, file_id, path,
+        stat.coverage, stat.covered, stat.total,
+        file_id, ''.join(runs_html),
+    )
+
+
+def _coverage_runs(file: FileCoverage) -> Iterator[Tuple[bool, int, int, int]]:
+    """Group a file's executable lines into (covered, start, end, count) runs.
+    
+    Lines without coverage data (blank, comments, ignored) do not break a
+    run, so a run spans from its first to its last executable line.
+    """
+    # Merge the two sorted line lists a run at a time: bisect finds where
+    # each run ends, so Python-level work is per run rather than per line.
+    covered = sorted(file.covered_lines)
+    uncovered = sorted(file.uncovered_lines)
+    n_covered, n_uncovered = len(covered), len(uncovered)
+    i = j = 0
+    
+    while i < n_covered and j < n_uncovered:
+        if covered[i] <= uncovered[j]:
+            k = bisect_right(covered, uncovered[j], i)
+            yield True, covered[i], covered[k - 1], k - i
+            i = k
+        else:
+            k = bisect_left(uncovered, covered[i], j)
+            yield False, uncovered[j], uncovered[k - 1], k - j
+            j = k
+    
+    if i < n_covered:
+        yield True, covered[i], covered[-1], n_covered - i
+    if j < n_uncovered:
+        yield False, uncovered[j], uncovered[-1], n_uncovered - j
 
 
 def main():
@@ -688,7 +951,7 @@ def main():
     )
     parser.add_argument(
         "--input", "-i",
-        help="Input file containing llvm-cov output (or use --profdata)"
+        help="Input file containing llvm-cov output, '-' for stdin (or use --profdata)"
     )
     parser.add_argument(
         "--profdata", "-p",
@@ -715,16 +978,26 @@ def main():
         default=75.0,
         help="Coverage threshold percentage (default: 75)"
     )
+    parser.add_argument(
+        "--only-uncovered",
+        action="store_true",
+        help="Only include HTML detail sections for files with uncovered lines"
+    )
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=1,
+        help="Worker processes for rendering HTML file details (default: 1)"
+    )
     
     args = parser.parse_args()
     
     # Determine input source
-    if args.input:
-        with open(args.input, 'r') as f:
-            input_data = f.read()
-        
-        parser = SwiftCoverageParser()
-        files = parser.parse_llvm_cov_text(input_data)
+    if args.input == "-":
+        files = SwiftCoverageParser.parse_llvm_cov_stream(sys.stdin.buffer)
+    elif args.input:
+        with open(args.input, 'rb') as f:
+            files = SwiftCoverageParser.parse_llvm_cov_stream(f)
     elif args.profdata and args.sources:
         print("Note: Direct .profdata parsing requires llvm-cov tool")
         print("Please run: swift test --enable-code-coverage")
@@ -744,7 +1017,7 @@ def main():
     generator = CoverageReportGenerator(files)
     
     if args.format in ["html", "all"]:
-        generator.generate_html_report(f"{args.output}/report.html")
+        generator.generate_html_report(f"{args.output}/report.html", args.only_uncovered, args.jobs)
     
     if args.format in ["json", "all"]:
         generator.generate_json_report(f"{args.output}/coverage.json", args.threshold)
@@ -4,25 +4,66 @@
 from __future__ import annotations
 
 import argparse
+import heapq
 import json
 import sys
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from operator import attrgetter
 from pathlib import Path
+from typing import Any
+
+# Optional orjson support. SwiftPM codecov exports carry per-file segment
+# arrays and run to tens of MB; orjson parses them noticeably faster than
+# stdlib json and serializes the report without the pure-Python indent
+# path. Fall back to stdlib json when it is not installed.
+try:
+    import orjson as _orjson_mod
+
+    def _load_json(path: Path) -> Any:
+        return _orjson_mod.loads(path.read_bytes())
+
+    def _write_json(path: Path, payload: dict[str, Any]) -> None:
+        # Route FileStat through _json_default so both backends emit the same fields.
+        options = (
+            _orjson_mod.OPT_INDENT_2 | _orjson_mod.OPT_APPEND_NEWLINE | _orjson_mod.OPT_PASSTHROUGH_DATACLASS
+        )
+        path.write_bytes(_orjson_mod.dumps(payload, default=_json_default, option=options))
+
+except ImportError:
+    _orjson_mod = None  # type: ignore[assignment]
+
+    def _load_json(path: Path) -> Any:
+        return json.loads(path.read_bytes())
+
+    def _write_json(path: Path, payload: dict[str, Any]) -> None:
+        path.write_text(json.dumps(payload, indent=2, default=_json_default) + "\n", encoding="utf-8")
 
 
 @dataclass
 class FileStat:
+    # Declared by hand rather than with dataclass(slots=True), which needs Python 3.10.
+    __slots__ = ("path", "module", "covered", "count", "percent", "module_id")
+
     path: str
     module: str
     covered: int
     count: int
-
-    @property
-    def percent(self) -> float:
-        if self.count == 0:
-            return 100.0
-        return (self.covered / self.count) * 100.0
+    percent: float
+    module_id: int
+
+
+def _json_default(obj: Any) -> dict[str, Any]:
+    """Serialize FileStat rows lazily, one dict at a time, while writing the report."""
+    if isinstance(obj, FileStat):
+        return {
+            "path": obj.path,
+            "module": obj.module,
+            "covered": obj.covered,
+            "count": obj.count,
+            "percent": obj.percent,
+        }
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 
 def parse_args() -> argparse.Namespace:
@@ -37,30 +78,53 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--output-json", default="", help="Optional output JSON path")
     parser.add_argument("--output-text", default="", help="Optional output text path")
     parser.add_argument("--worst-files", type=int, default=20, help="Number of low-coverage files to print")
+    parser.add_argument(
+        "--sort-files",
+        choices=("full", "partial", "none"),
+        default="full",
+        help=(
+            "Order of the JSON files list: full sorts every file by coverage; partial sorts only the "
+            "worst files and keeps the rest in export order; none keeps export order"
+        ),
+    )
     return parser.parse_args()
 
 
 def source_module(path: str) -> str | None:
     marker = "/Sources/"
-    if marker not in path:
+    index = path.find(marker)
+    if index < 0:
         return None
-    after = path.split(marker, 1)[1]
-    if "/" not in after:
+    start = index + len(marker)
+    end = path.find("/", start)
+    if end < 0:
         return None
-    return after.split("/", 1)[0]
+    return path[start:end]
+
 
+def module_ids(modules: list[str]) -> dict[str, int]:
+    """Assign each selected module a dense index, in first-seen order."""
+    return {module: index for index, module in enumerate(dict.fromkeys(modules))}
 
-def load_file_stats(coverage_json: Path, modules: set[str]) -> list[FileStat]:
-    with coverage_json.open("r", encoding="utf-8") as handle:
-        payload = json.load(handle)
 
+def load_file_stats(coverage_json: Path, modules: dict[str, int]) -> list[FileStat]:
+    payload = _load_json(coverage_json)
     files = payload.get("data", [{}])[0].get("files", [])
+    # Canonical module names, indexed by id. Rows share these objects instead of
+    # each keeping its own substring sliced out of the path.
+    module_names = list(modules)
     stats: list[FileStat] = []
 
     for item in files:
         path = item.get("filename", "")
+        # Cheap reject for toolchain, test and checkout files before the function call.
+        if "/Sources/" not in path:
+            continue
         module = source_module(path)
-        if module is None or module not in modules:
+        if module is None:
+            continue
+        module_id = modules.get(module)
+        if module_id is None:
             continue
 
         lines = item.get("summary", {}).get("lines", {})
@@ -69,31 +133,38 @@ def load_file_stats(coverage_json: Path, modules: set[str]) -> list[FileStat]:
         if count <= 0:
             continue
 
-        stats.append(FileStat(path=path, module=module, covered=covered, count=count))
+        percent = (covered / count) * 100.0
+        stats.append(FileStat(path, module_names[module_id], covered, count, percent, module_id))
 
     return stats
 
 
 def render_report(
-    stats: list[FileStat], modules: list[str], threshold: float, worst_files: int
-) -> tuple[str, dict]:
-    module_totals: dict[str, dict[str, int]] = {module: {"covered": 0, "count": 0} for module in modules}
-    overall_covered = 0
-    overall_count = 0
+    stats: list[FileStat],
+    modules: list[str],
+    threshold: float,
+    worst_files: int,
+    timestamp: str,
+    sort_files: str = "full",
+) -> tuple[str, dict[str, Any]]:
+    ids = module_ids(modules)
+    covered_by_module = [0] * len(ids)
+    count_by_module = [0] * len(ids)
 
     for stat in stats:
-        module_totals[stat.module]["covered"] += stat.covered
-        module_totals[stat.module]["count"] += stat.count
-        overall_covered += stat.covered
-        overall_count += stat.count
+        covered_by_module[stat.module_id] += stat.covered
+        count_by_module[stat.module_id] += stat.count
 
+    # Every stat belongs to a selected module, so the overall totals are the module sums.
+    overall_covered = sum(covered_by_module)
+    overall_count = sum(count_by_module)
     overall_percent = (overall_covered / overall_count * 100.0) if overall_count else 0.0
     all_modules_pass = True
 
     per_module_payload: dict[str, dict[str, float | int | str]] = {}
     for module in modules:
-        covered = module_totals[module]["covered"]
-        count = module_totals[module]["count"]
+        covered = covered_by_module[ids[module]]
+        count = count_by_module[ids[module]]
         percent = (covered / count * 100.0) if count else 0.0
         module_ok = percent >= threshold
         if not module_ok:
@@ -106,28 +177,39 @@ def render_report(
         }
 
     passed = overall_percent >= threshold and all_modules_pass
-
-    lines: list[str] = []
-    lines.append("SwiftMTP Filtered Coverage")
-    lines.append("==========================")
-    lines.append(f"Threshold: {threshold:.2f}%")
-    lines.append(f"Overall:   {overall_percent:.2f}% ({overall_covered}/{overall_count})")
-    lines.append(f"Status:    {'PASS' if passed else 'FAIL'}")
-    lines.append("")
-    lines.append("Module Coverage:")
+    sort_key = attrgetter("percent", "count")
+    if sort_files == "full":
+        # The JSON payload lists every file in this order, so one full sort serves both outputs.
+        sorted_stats = sorted(stats, key=sort_key)
+        worst = sorted_stats[:worst_files]
+    else:
+        worst = heapq.nsmallest(worst_files, stats, key=sort_key)
+        if sort_files == "partial":
+            worst_ids = {id(stat) for stat in worst}
+            sorted_stats = worst + [stat for stat in stats if id(stat) not in worst_ids]
+        else:
+            sorted_stats = stats
+
+    lines: list[str] = [
+        "SwiftMTP Filtered Coverage",
+        "==========================",
+        f"Threshold: {threshold:.2f}%",
+        f"Overall:   {overall_percent:.2f}% ({overall_covered}/{overall_count})",
+        f"Status:    {'PASS' if passed else 'FAIL'}",
+        "",
+        "Module Coverage:",
+    ]
 
     for module in modules:
         info = per_module_payload[module]
         status = "PASS" if info["status"] == "pass" else "FAIL"
         lines.append(f"  - {module}: {info['percent']:.2f}% ({info['covered']}/{info['count']}) [{status}]")
 
-    lines.append("")
-    lines.append(f"Worst {worst_files} Files:")
-    for stat in sorted(stats, key=lambda item: (item.percent, item.count))[:worst_files]:
-        lines.append(f"  - {stat.percent:6.2f}%  {stat.path}")
+    lines.extend(("", f"Worst {worst_files} Files:"))
+    lines.extend(f"  - {stat.percent:6.2f}%  {stat.path}" for stat in worst)
 
     payload = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": timestamp,
         "threshold": threshold,
         "status": "pass" if passed else "fail",
         "overall": {
@@ -136,16 +218,9 @@ def render_report(
             "percent": overall_percent,
         },
         "modules": per_module_payload,
-        "files": [
-            {
-                "path": stat.path,
-                "module": stat.module,
-                "covered": stat.covered,
-                "count": stat.count,
-                "percent": stat.percent,
-            }
-            for stat in sorted(stats, key=lambda item: (item.percent, item.count))
-        ],
+        # FileStat rows are converted by _json_default at write time rather than
+        # copied into a second list of dicts here.
+        "files": sorted_stats,
     }
 
     return "\n".join(lines) + "\n", payload
@@ -163,13 +238,19 @@ def main() -> int:
         print("error: at least one module is required", file=sys.stderr)
         return 2
 
-    module_set = set(modules)
-    stats = load_file_stats(coverage_json, module_set)
+    stats = load_file_stats(coverage_json, module_ids(modules))
     if not stats:
         print("error: no matching source files found for selected modules", file=sys.stderr)
         return 2
 
-    report, payload = render_report(stats=stats, modules=modules, threshold=args.threshold, worst_files=args.worst_files)
+    report, payload = render_report(
+        stats=stats,
+        modules=modules,
+        threshold=args.threshold,
+        worst_files=args.worst_files,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+        sort_files=args.sort_files,
+    )
     print(report, end="")
 
     if args.output_text:
@@ -180,7 +261,7 @@ def main() -> int:
     if args.output_json:
         output_json = Path(args.output_json)
         output_json.parent.mkdir(parents=True, exist_ok=True)
-        output_json.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        _write_json(output_json, payload)
 
     return 0 if payload["status"] == "pass" else 1
 
@@ -52,18 +52,23 @@ Expectation overlays
 from __future__ import annotations
 
 import argparse
+import collections
+import concurrent.futures
 import datetime
+import functools
+import itertools
 import json
 import logging
+import operator
 import os
 import pathlib
 import re
+import shutil
+import stat
 import subprocess
 import sys
-import tempfile
-import textwrap
-import uuid
-from typing import Any, Dict, Generator, List, Optional, Tuple
+import threading
+from typing import Any, BinaryIO, Callable, Dict, Generator, List, Optional, Tuple, Union
 
 # ---------------------------------------------------------------------------
 # Optional YAML support (PyYAML).  stdlib has no YAML parser; fall back
@@ -72,9 +77,12 @@ from typing import Any, Dict, Generator, List, Optional, Tuple
 try:
     import yaml as _yaml_mod
 
+    # libyaml-backed loader when PyYAML was built with it; same safe subset.
+    _YamlLoader = getattr(_yaml_mod, "CSafeLoader", _yaml_mod.SafeLoader)
+
     def _load_yaml(path: pathlib.Path) -> Dict[str, Any]:
         with path.open(encoding="utf-8") as fh:
-            return _yaml_mod.safe_load(fh) or {}
+            return _yaml_mod.load(fh, Loader=_YamlLoader) or {}
 
 except ImportError:
     _yaml_mod = None  # type: ignore[assignment]
@@ -88,12 +96,58 @@ except ImportError:
         return {}
 
 
+# ---------------------------------------------------------------------------
+# Optional orjson support.  Its C codec parses SwiftMTP's JSON output and
+# serialises the large evidence dumps several times faster than stdlib json
+# (whose indent path is pure Python); fall back to stdlib json when it is
+# not installed.
+# ---------------------------------------------------------------------------
+try:
+    import orjson as _orjson_mod
+
+    def _json_loads(raw: str) -> Any:
+        try:
+            return _orjson_mod.loads(raw)
+        except _orjson_mod.JSONDecodeError:
+            # orjson rejects some input stdlib accepts (NaN, Infinity); let
+            # stdlib decide, and raise its error, so results and messages
+            # match the fallback.  (orjson reads integers beyond the 64-bit
+            # range as floats; SwiftMTP's sizes and IDs all fit in UInt64.)
+            return json.loads(raw)
+
+    def _write_json(path: pathlib.Path, data: Any, *, indent: Optional[int] = 2) -> None:
+        """Write *data* to *path* as JSON; ``indent=None`` writes compact output.
+
+        orjson only indents by two, so any non-None *indent* means two.
+        """
+        option = _orjson_mod.OPT_NON_STR_KEYS
+        if indent is not None:
+            option |= _orjson_mod.OPT_INDENT_2
+        _write_bytes(path, _orjson_mod.dumps(data, default=_json_default, option=option))
+
+except ImportError:
+    _orjson_mod = None  # type: ignore[assignment]
+
+    def _json_loads(raw: str) -> Any:  # type: ignore[misc]
+        return json.loads(raw)
+
+    def _write_json(path: pathlib.Path, data: Any, *, indent: Optional[int] = 2) -> None:  # type: ignore[misc]
+        """Stream *data* to *path* as JSON; ``indent=None`` writes compact output."""
+        separators = (",", ":") if indent is None else None
+        with path.open("w", encoding="utf-8", buffering=1 << 16) as fh:
+            json.dump(data, fh, indent=indent, separators=separators, default=_json_default)
+
+
 # ---------------------------------------------------------------------------
 # Logging
 # ---------------------------------------------------------------------------
 
+_LOGGER = logging.getLogger("compat-harness")
+
+
 def _log() -> logging.Logger:
-    return logging.getLogger("compat-harness")
+    # getLogger takes the logging module lock on every call; resolve once.
+    return _LOGGER
 
 
 logging.basicConfig(
@@ -111,6 +165,12 @@ _SWIFTMTPKIT_DIR = _REPO_ROOT / "SwiftMTPKit"
 _COMPAT_DIR = _REPO_ROOT / "compat"
 _EVIDENCE_ROOT = _REPO_ROOT / "evidence"
 _EXPECTATIONS_DIR = _COMPAT_DIR / "expectations"
+_TOOL_VERSION_CACHE = (
+    pathlib.Path(os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache")
+    / "swiftmtp"
+    / "compat-harness"
+    / "toolver.json"
+)
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -141,28 +201,40 @@ def _run(
     *,
     cwd: Optional[pathlib.Path] = None,
     timeout: int = 120,
+    merge_stderr: bool = False,
+    stdout: Any = subprocess.PIPE,
 ) -> subprocess.CompletedProcess:
-    """Run *cmd* and return CompletedProcess.  Never raises on non-zero exit."""
-    _log().debug("exec: %s  (cwd=%s)", " ".join(cmd), cwd or ".")
+    """Run *cmd* and return CompletedProcess.  Never raises on non-zero exit.
+
+    With *merge_stderr*, stderr is redirected into stdout so both streams
+    arrive as one buffer (``stderr`` is then None).  Pass a binary file as
+    *stdout* to have the child write to it directly; ``stdout`` on the
+    result is then None unless the command could not be run.
+    """
+    if _LOGGER.isEnabledFor(logging.DEBUG):  # skip the join unless -v
+        _LOGGER.debug("exec: %s  (cwd=%s)", " ".join(cmd), cwd or ".")
     try:
         return subprocess.run(
             cmd,
             cwd=str(cwd) if cwd else None,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stdout=stdout,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
             text=True,
             timeout=timeout,
         )
     except FileNotFoundError:
-        result = subprocess.CompletedProcess(cmd, returncode=127, stdout="", stderr="")
-        result.stderr = f"command not found: {cmd[0]}"
-        return result
+        message = f"command not found: {cmd[0]}"
+        returncode = 127
     except subprocess.TimeoutExpired:
-        result = subprocess.CompletedProcess(cmd, returncode=124, stdout="", stderr="")
-        result.stderr = f"timed out after {timeout}s: {' '.join(cmd)}"
-        return result
+        message = f"timed out after {timeout}s: {' '.join(cmd)}"
+        returncode = 124
+    if merge_stderr:
+        return subprocess.CompletedProcess(cmd, returncode=returncode, stdout=message, stderr=None)
+    return subprocess.CompletedProcess(cmd, returncode=returncode, stdout="", stderr=message)
 
 
+# Tool lookups are answered once per run; each probe is a fork otherwise.
+@functools.lru_cache(maxsize=None)
 def _tool_version(name: str) -> Optional[str]:
     """Return a short version string for *name*, or None if not found."""
     for flag in ("--version", "-V", "version"):
@@ -173,9 +245,85 @@ def _tool_version(name: str) -> Optional[str]:
     return None
 
 
+_TOOL_VERSION_CACHE_LOCK = threading.Lock()
+
+
+def _read_tool_version_cache() -> Dict[str, Any]:
+    try:
+        cache = json.loads(_TOOL_VERSION_CACHE.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+# Tools reached through a toolchain-selector shim (xcrun's /usr/bin/swift,
+# swiftly's proxy): the file on PATH stays the same when `xcode-select -s`
+# or a swiftly switch changes the toolchain behind it, so nothing about it
+# can key a cache entry.  Their versions are always queried live.
+_UNCACHEABLE_VERSION_TOOLS = frozenset({"swift"})
+
+
+def _cached_tool_version(name: str) -> Optional[str]:
+    """_tool_version, remembered across runs in a small JSON file.
+
+    mtp-detect has no version flag, so "--version" runs a full detect.
+    Entries are keyed on the resolved binary plus its mtime and size.
+    """
+    if name in _UNCACHEABLE_VERSION_TOOLS:
+        return _tool_version(name)
+    exe = _which(name)
+    if exe is None:
+        return _tool_version(name)
+    try:
+        real = os.path.realpath(exe)
+        st = os.stat(real)
+    except OSError:
+        return _tool_version(name)
+    key = "|".join(
+        (
+            real,
+            str(st.st_mtime_ns),
+            str(st.st_size),
+        )
+    )
+
+    with _TOOL_VERSION_CACHE_LOCK:
+        cached = _read_tool_version_cache().get(name)
+    if isinstance(cached, dict) and cached.get("key") == key:
+        return cached.get("version")
+
+    version = _tool_version(name)
+    if version is None:
+        return None  # may be transient; try again next run
+
+    with _TOOL_VERSION_CACHE_LOCK:
+        # Re-read: another tool's lookup may have updated the file meanwhile.
+        cache = _read_tool_version_cache()
+        cache[name] = {"key": key, "version": version}
+        tmp_path = _TOOL_VERSION_CACHE.with_name(
+            f"{_TOOL_VERSION_CACHE.name}.{os.getpid()}.tmp"
+        )
+        try:
+            _TOOL_VERSION_CACHE.parent.mkdir(parents=True, exist_ok=True)
+            _write_bytes(tmp_path, json.dumps(cache, indent=2).encode("utf-8"))
+            os.replace(tmp_path, _TOOL_VERSION_CACHE)
+        except OSError as exc:
+            _log().debug("Could not write tool version cache %s: %s", _TOOL_VERSION_CACHE, exc)
+    return version
+
+
+@functools.lru_cache(maxsize=None)
+def _which(name: str) -> Optional[str]:
+    """shutil.which, once per name: the availability check and the version
+    cache key both need the same PATH walk."""
+    return shutil.which(name)
+
+
 def _check_tool(name: str) -> bool:
-    r = _run(["which", name], timeout=5)
-    return r.returncode == 0
+    # A PATH lookup in-process; no need to fork `which`.  Probing with the
+    # tool itself is not an option: mtp-* tools ignore --version and would
+    # talk to the device.
+    return _which(name) is not None
 
 
 # ---------------------------------------------------------------------------
@@ -192,8 +340,8 @@ class LibmtpRunner:
     # --- detect -------------------------------------------------------------
 
     def detect(self) -> Tuple[Dict[str, Any], str]:
-        r = _run(["mtp-detect"], timeout=self.timeout)
-        raw = (r.stdout or "") + (r.stderr or "")
+        r = _run(["mtp-detect"], timeout=self.timeout, merge_stderr=True)
+        raw = r.stdout or ""
         if r.returncode == 127:
             return {"error": "mtp-detect not found"}, raw
         return _parse_mtp_detect(raw, self.vidpid), raw
@@ -201,8 +349,8 @@ class LibmtpRunner:
     # --- folders ------------------------------------------------------------
 
     def folders(self) -> Tuple[List[Dict[str, Any]], str]:
-        r = _run(["mtp-folders"], timeout=self.timeout)
-        raw = (r.stdout or "") + (r.stderr or "")
+        r = _run(["mtp-folders"], timeout=self.timeout, merge_stderr=True)
+        raw = r.stdout or ""
         if r.returncode == 127:
             return [], raw
         return _parse_mtp_folders(raw), raw
@@ -210,8 +358,8 @@ class LibmtpRunner:
     # --- files --------------------------------------------------------------
 
     def files(self) -> Tuple[List[Dict[str, Any]], str]:
-        r = _run(["mtp-files"], timeout=self.timeout)
-        raw = (r.stdout or "") + (r.stderr or "")
+        r = _run(["mtp-files"], timeout=self.timeout, merge_stderr=True)
+        raw = r.stdout or ""
         if r.returncode == 127:
             return [], raw
         return _parse_mtp_files(raw), raw
@@ -219,66 +367,103 @@ class LibmtpRunner:
     # --- sendfile -----------------------------------------------------------
 
     def sendfile(self, local_path: str, remote_name: str) -> Tuple[bool, str]:
-        r = _run(["mtp-sendfile", local_path, remote_name], timeout=self.timeout)
-        return r.returncode == 0, (r.stdout or "") + (r.stderr or "")
+        r = _run(
+            ["mtp-sendfile", local_path, remote_name],
+            timeout=self.timeout,
+            merge_stderr=True,
+        )
+        return r.returncode == 0, r.stdout or ""
 
 
 # --- mtp-detect parser ------------------------------------------------------
 
+# Patterns are compiled once here; the parsers below run them against every
+# line of tool output, which for mtp-files can be tens of thousands of lines.
+
+# "Device 0 (VID=18d1 and PID=4ee1) is a Google Inc..."
+_DETECT_DEVICE_RE = re.compile(
+    r"Device\s+(\d+)\s+\(VID=([0-9a-fA-F]+)\s+and\s+PID=([0-9a-fA-F]+)\)"
+)
+# The remaining lines are plain "Key: value" pairs, parsed with str methods.
+
+
+def _field_text(rest: str) -> Optional[str]:
+    """Return the stripped value following a "Key:" label, or None.
+
+    Mirrors the regex tail ``:\\s+(.+)``: at least one whitespace character
+    followed by at least one more character.
+    """
+    if len(rest) > 1 and rest[0].isspace():
+        return rest.strip()
+    return None
+
+
+def _field_int(rest: str) -> Optional[int]:
+    """Return the leading integer following a label, or None (mirrors ``\\s+(\\d+)``)."""
+    if not rest[:1].isspace():
+        return None
+    digits = "".join(itertools.takewhile(str.isdecimal, rest.lstrip()))
+    return int(digits) if digits else None
+
+
+# "Key" → (is a storage attribute, destination attribute, value parser).
+_DETECT_FIELDS: Dict[str, Tuple[bool, str, Callable[[str], Any]]] = {
+    "Manufacturer": (False, "manufacturer", _field_text),
+    "Model": (False, "model", _field_text),
+    "Serial number": (False, "serial", _field_text),
+    "Device version": (False, "firmware", _field_text),
+    "Friendly name": (False, "friendly_name", _field_text),
+    "StorageDescription": (True, "description", _field_text),
+    "VolumeIdentifier": (True, "volume", _field_text),
+    "MaxCapacity": (True, "capacity_bytes", _field_int),
+    "FreeSpaceInBytes": (True, "free_bytes", _field_int),
+}
+
+
 def _parse_mtp_detect(raw: str, vidpid: Optional[str]) -> Dict[str, Any]:
     """Best-effort parser for mtp-detect text output (tolerates version variation)."""
     devices: List[Dict[str, Any]] = []
     cur: Optional[Dict[str, Any]] = None
 
     for line in raw.splitlines():
-        # "Device 0 (VID=18d1 and PID=4ee1) is a Google Inc..."
-        m = re.match(
-            r"Device\s+(\d+)\s+\(VID=([0-9a-fA-F]+)\s+and\s+PID=([0-9a-fA-F]+)\)",
-            line,
-        )
-        if m:
-            cur = {
-                "index": int(m.group(1)),
-                "vid": m.group(2).lower(),
-                "pid": m.group(3).lower(),
-                "storages": [],
-            }
-            devices.append(cur)
-            continue
+        if line.startswith("Device"):
+            m = _DETECT_DEVICE_RE.match(line)
+            if m:
+                cur = {
+                    "index": int(m.group(1)),
+                    "vid": m.group(2).lower(),
+                    "pid": m.group(3).lower(),
+                    "storages": [],
+                }
+                devices.append(cur)
+                continue
 
         if cur is None:
             continue
 
-        for attr, pattern in (
-            ("manufacturer", r"\s+Manufacturer:\s+(.+)"),
-            ("model", r"\s+Model:\s+(.+)"),
-            ("serial", r"\s+Serial number:\s+(.+)"),
-            ("firmware", r"\s+Device version:\s+(.+)"),
-            ("friendly_name", r"\s+Friendly name:\s+(.+)"),
-        ):
-            m = re.match(pattern, line)
-            if m:
-                cur[attr] = m.group(1).strip()
-                break
-        else:
-            # Storage blocks
-            m = re.match(r"\s+Storage\s+(\d+)\s*:", line)
-            if m:
-                cur["storages"].append({"id": int(m.group(1))})
+        # Every device and storage attribute line is indented and has a colon.
+        if not line[:1].isspace() or ":" not in line:
+            continue
+
+        key, _, rest = line.lstrip().partition(":")
+        field = _DETECT_FIELDS.get(key)
+        if field is None:
+            # Storage blocks open with a "Storage 65537:" header line.
+            parts = key.split()
+            if len(parts) == 2 and parts[0] == "Storage" and parts[1].isdecimal():
+                cur["storages"].append({"id": int(parts[1])})
+            continue
+
+        in_storage, attr, parse_value = field
+        if in_storage:
+            if not cur.get("storages"):
                 continue
-            for storage_attr, storage_pattern in (
-                ("description", r"\s+StorageDescription:\s+(.+)"),
-                ("volume", r"\s+VolumeIdentifier:\s+(.+)"),
-                ("capacity_bytes", r"\s+MaxCapacity:\s+(\d+)"),
-                ("free_bytes", r"\s+FreeSpaceInBytes:\s+(\d+)"),
-            ):
-                m = re.match(storage_pattern, line)
-                if m and cur.get("storages"):
-                    val: Any = m.group(1).strip()
-                    if storage_attr in ("capacity_bytes", "free_bytes"):
-                        val = int(val)
-                    cur["storages"][-1][storage_attr] = val
-                    break
+            target = cur["storages"][-1]
+        else:
+            target = cur
+        val = parse_value(rest)
+        if val is not None:
+            target[attr] = val
 
     if vidpid:
         vid, pid = vidpid.lower().split(":")
@@ -289,16 +474,20 @@ def _parse_mtp_detect(raw: str, vidpid: Optional[str]) -> Dict[str, Any]:
 
 # --- mtp-folders parser -----------------------------------------------------
 
+# "Folder: 65537 (parent: 0)  Name: DCIM"
+_FOLDER_RE = re.compile(
+    r"\s*Folder[:\s]+(\d+)\s+\(parent:\s*(\d+)\)[,\s]+Name:\s+(.+)",
+    re.IGNORECASE,
+)
+
+
 def _parse_mtp_folders(raw: str) -> List[Dict[str, Any]]:
     """Parse mtp-folders text output into a list of folder dicts."""
     folders: List[Dict[str, Any]] = []
     for line in raw.splitlines():
-        # "Folder: 65537 (parent: 0)  Name: DCIM"
-        m = re.match(
-            r"\s*Folder[:\s]+(\d+)\s+\(parent:\s*(\d+)\)[,\s]+Name:\s+(.+)",
-            line,
-            re.IGNORECASE,
-        )
+        if "(" not in line:
+            continue
+        m = _FOLDER_RE.match(line)
         if m:
             folders.append(
                 {
@@ -312,37 +501,51 @@ def _parse_mtp_folders(raw: str) -> List[Dict[str, Any]]:
 
 # --- mtp-files parser -------------------------------------------------------
 
+# "File: 65538 (parent: 65537, storage: 65537)"
+_FILE_HEADER_RE = re.compile(r"\s*File[:\s]+(\d+)\s+\(parent:\s*(\d+)", re.IGNORECASE)
+_FILE_NAME_RE = re.compile(r"\s*Filename:\s+(.+)", re.IGNORECASE)
+_FILE_SIZE_RE = re.compile(r"\s*File size\s+(\d+)", re.IGNORECASE)
+_FILE_MTIME_RE = re.compile(r"\s*Modified date:\s+(.+)", re.IGNORECASE)
+
+
 def _parse_mtp_files(raw: str) -> List[Dict[str, Any]]:
     """Parse mtp-files text output into a list of file dicts."""
     files: List[Dict[str, Any]] = []
     cur: Optional[Dict[str, Any]] = None
 
     for line in raw.splitlines():
-        # "File: 65538 (parent: 65537, storage: 65537)"
-        m = re.match(r"\s*File[:\s]+(\d+)\s+\(parent:\s*(\d+)", line, re.IGNORECASE)
-        if m:
-            cur = {"id": int(m.group(1)), "parent_id": int(m.group(2))}
-            files.append(cur)
-            continue
+        # Cheap substring gates skip the Parent ID / Storage ID / Filetype
+        # lines that none of the patterns can match.  The patterns are
+        # case-insensitive, so the gates test a lowercased copy.
+        lowered = line.lower()
+        if "(parent:" in lowered:
+            m = _FILE_HEADER_RE.match(line)
+            if m:
+                cur = {"id": int(m.group(1)), "parent_id": int(m.group(2))}
+                files.append(cur)
+                continue
 
         if cur is None:
             continue
 
-        m = re.match(r"\s*Filename:\s+(.+)", line, re.IGNORECASE)
-        if m:
-            cur["name"] = m.group(1).strip()
-            continue
+        if "filename:" in lowered:
+            m = _FILE_NAME_RE.match(line)
+            if m:
+                cur["name"] = m.group(1).strip()
+                continue
 
-        m = re.match(r"\s*File size\s+(\d+)", line, re.IGNORECASE)
-        if m:
-            cur["size_bytes"] = int(m.group(1))
-            continue
+        if "file size" in lowered:
+            m = _FILE_SIZE_RE.match(line)
+            if m:
+                cur["size_bytes"] = int(m.group(1))
+                continue
 
-        m = re.match(r"\s*Modified date:\s+(.+)", line, re.IGNORECASE)
-        if m:
-            ts = _parse_iso_or_ctime(m.group(1).strip())
-            if ts is not None:
-                cur["mtime"] = ts
+        if "modified date:" in lowered:
+            m = _FILE_MTIME_RE.match(line)
+            if m:
+                ts = _parse_iso_or_ctime(m.group(1).strip())
+                if ts is not None:
+                    cur["mtime"] = ts
 
     return files
 
@@ -370,6 +573,25 @@ class SwiftMTPRunner:
             cmd += ["--device", self.vidpid]
         return cmd
 
+    def build(self, out: BinaryIO) -> bool:
+        """Compile the swiftmtp product; needs the toolchain, not the device.
+
+        Build output is only ever logged and can run to megabytes, so the
+        compiler writes it straight into *out* instead of through a pipe.
+        """
+        r = _run(
+            ["swift", "build", "--product", "swiftmtp"],
+            cwd=self.dir,
+            timeout=self.timeout,
+            merge_stderr=True,
+            stdout=out,
+        )
+        if r.stdout:  # _run's own "not found" / "timed out" message
+            out.write(r.stdout.encode("utf-8"))
+        return r.returncode == 0
+
+    # probe and ls keep stderr on its own pipe: stdout must be pure JSON.
+
     def probe(self) -> Tuple[Dict[str, Any], str]:
         r = _run(self._base() + ["probe", "--json"], cwd=self.dir, timeout=self.timeout)
         raw = r.stdout or ""
@@ -377,7 +599,7 @@ class SwiftMTPRunner:
         if r.returncode == 127:
             return {"error": "swift not found"}, err
         try:
-            return json.loads(raw), raw + err
+            return _json_loads(raw), raw + err
         except json.JSONDecodeError as exc:
             return {"error": f"JSON parse error: {exc}", "raw": raw[:500]}, raw + err
 
@@ -388,7 +610,7 @@ class SwiftMTPRunner:
         if r.returncode == 127:
             return [], err
         try:
-            return json.loads(raw), raw + err
+            return _json_loads(raw), raw + err
         except json.JSONDecodeError as exc:
             return {"error": f"JSON parse error: {exc}", "raw": raw[:500]}, raw + err
 
@@ -397,23 +619,72 @@ class SwiftMTPRunner:
             self._base() + ["push", local_path, remote_path],
             cwd=self.dir,
             timeout=self.timeout,
+            merge_stderr=True,
         )
-        return r.returncode == 0, (r.stdout or "") + (r.stderr or "")
+        return r.returncode == 0, r.stdout or ""
 
 
 # ---------------------------------------------------------------------------
 # Timestamp helper
 # ---------------------------------------------------------------------------
 
+# strptime formats, split on whether they contain a colon so that a string
+# is only tried against formats it could possibly match.
+_TS_FORMATS_COMPACT: Tuple[str, ...] = (
+    "%Y%m%dT%H%M%S",       # 20230101T120000  (MTP compact ISO)
+)
+_TS_FORMATS_COLON: Tuple[str, ...] = (
+    "%Y-%m-%dT%H:%M:%S",   # 2023-01-01T12:00:00
+    "%Y-%m-%d %H:%M:%S",   # 2023-01-01 12:00:00
+    "%a %b %d %H:%M:%S %Y",  # Mon Jan 01 12:00:00 2023  (ctime)
+)
+
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def _parse_fixed_width(s: str) -> Optional[int]:
+    """Slice the two common fixed-width layouts directly, skipping strptime.
+
+    Handles ``YYYYMMDDTHHMMSS`` and ``YYYY-MM-DD[T ]HH:MM:SS`` with every
+    field fully padded.  Returns None for anything else, including
+    out-of-range fields, so the caller can fall back to strptime and keep
+    its (more lenient) behaviour for unusual input.
+    """
+    if len(s) == 15 and s[8] in "Tt":
+        digits = s[:8] + s[9:]
+    elif (
+        len(s) == 19
+        and s[4] == "-"
+        and s[7] == "-"
+        and s[10] in "Tt "
+        and s[13] == ":"
+        and s[16] == ":"
+    ):
+        digits = s[:4] + s[5:7] + s[8:10] + s[11:13] + s[14:16] + s[17:]
+    else:
+        return None
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    hour, minute, second = int(digits[8:10]), int(digits[10:12]), int(digits[12:])
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    try:
+        date = datetime.date(int(digits[:4]), int(digits[4:6]), int(digits[6:8]))
+    except ValueError:
+        return None
+    return (date.toordinal() - _EPOCH_ORDINAL) * 86400 + hour * 3600 + minute * 60 + second
+
+
+# Files written in the same session share timestamps, so repeated strings
+# are common across a listing; every failed strptime costs an exception.
+@functools.lru_cache(maxsize=8192)
 def _parse_iso_or_ctime(s: str) -> Optional[int]:
     """Parse a date/time string into a UTC Unix timestamp, or return None."""
-    formats = [
-        "%Y%m%dT%H%M%S",       # 20230101T120000  (MTP compact ISO)
-        "%Y-%m-%dT%H:%M:%S",   # 2023-01-01T12:00:00
-        "%Y-%m-%d %H:%M:%S",   # 2023-01-01 12:00:00
-        "%a %b %d %H:%M:%S %Y",  # Mon Jan 01 12:00:00 2023  (ctime)
-    ]
-    for fmt in formats:
+    ts = _parse_fixed_width(s)
+    if ts is not None:
+        return ts
+    for fmt in _TS_FORMATS_COLON if ":" in s else _TS_FORMATS_COMPACT:
         try:
             dt = datetime.datetime.strptime(s, fmt)
             return int(dt.replace(tzinfo=datetime.timezone.utc).timestamp())
@@ -488,6 +759,9 @@ def _normalise_device(
     return _norm_lib(libmtp_detect), _norm_swift(swiftmtp_probe)
 
 
+_PATH_KEY = operator.itemgetter("path")
+
+
 def _normalise_files(
     libmtp_files: List[Dict[str, Any]],
     libmtp_folders: List[Dict[str, Any]],
@@ -495,15 +769,20 @@ def _normalise_files(
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     """Return sorted, path-resolved file lists for each side."""
 
-    # Build an id→absolute-path map from the libmtp folder list.
-    folder_map: Dict[int, str] = {0: ""}
-    for folder in sorted(libmtp_folders, key=lambda f: f.get("id", 0)):
-        fid = folder.get("id", 0)
-        parent = folder_map.get(folder.get("parent_id", 0), "")
-        name = folder.get("name", str(fid))
-        folder_map[fid] = f"{parent}/{name}" if parent else name
-
     def _lib_files() -> List[Dict[str, Any]]:
+        if not libmtp_files:
+            # mtp-files failed or found nothing; the folder map below only
+            # serves to resolve file paths, so don't build it.
+            return []
+
+        # Build an id→absolute-path map from the libmtp folder list.
+        folder_map: Dict[int, str] = {0: ""}
+        for folder in sorted(libmtp_folders, key=lambda f: f.get("id", 0)):
+            fid = folder.get("id", 0)
+            parent = folder_map.get(folder.get("parent_id", 0), "")
+            name = folder.get("name", str(fid))
+            folder_map[fid] = f"{parent}/{name}" if parent else name
+
         out: List[Dict[str, Any]] = []
         for f in libmtp_files:
             parent_path = folder_map.get(f.get("parent_id", 0), "")
@@ -513,7 +792,8 @@ def _normalise_files(
             if "mtime" in f:
                 entry["mtime"] = f["mtime"]
             out.append(entry)
-        return sorted(out, key=lambda x: x["path"])
+        out.sort(key=_PATH_KEY)
+        return out
 
     def _swift_files() -> List[Dict[str, Any]]:
         out: List[Dict[str, Any]] = []
@@ -537,7 +817,8 @@ def _normalise_files(
                 if ts is not None:
                     entry["mtime"] = ts
             out.append(entry)
-        return sorted(out, key=lambda x: x["path"])
+        out.sort(key=_PATH_KEY)
+        return out
 
     return _lib_files(), _swift_files()
 
@@ -549,13 +830,25 @@ def _flatten_tree(
     stream of file-entry dicts, each with a 'path' key set to the full path."""
     if not isinstance(items, list):
         return
-    for item in items:
-        name = item.get("name", "")
-        path = f"{prefix}/{name}" if prefix else name
-        if item.get("type") == "folder":
-            yield from _flatten_tree(item.get("children", []), path)
+    # Walk with an explicit stack of (iterator, folder path) rather than
+    # nested ``yield from`` generators, which hand every entry up through
+    # one generator frame per folder level.  Order is the same depth-first
+    # pre-order as the recursive walk.
+    stack: List[Tuple[Any, str]] = [(iter(items), prefix)]
+    while stack:
+        it, folder = stack[-1]
+        for item in it:
+            name = item.get("name", "")
+            path = f"{folder}/{name}" if folder else name
+            if item.get("type") == "folder":
+                children = item.get("children", [])
+                if isinstance(children, list):
+                    stack.append((iter(children), path))
+                    break
+            else:
+                yield {**item, "path": path}
         else:
-            yield {**item, "path": path}
+            stack.pop()
 
 
 # ---------------------------------------------------------------------------
@@ -595,11 +888,21 @@ def _diff_device(
     norm_lib: Dict[str, Any],
     norm_swift: Dict[str, Any],
 ) -> List[DiffEntry]:
+    if norm_lib == norm_swift:
+        return []
+    lib_keys, swift_keys = norm_lib.keys(), norm_swift.keys()
     diffs: List[DiffEntry] = []
-    for key in sorted(set(norm_lib) | set(norm_swift)):
-        a, b = norm_lib.get(key), norm_swift.get(key)
+    for key in sorted(lib_keys & swift_keys):
+        a, b = norm_lib[key], norm_swift[key]
         if a != b:
             diffs.append(DiffEntry(f"device.{key}", a, b))
+    # One-sided keys compare against a missing value; a None there is no diff.
+    for key in sorted(lib_keys - swift_keys):
+        if norm_lib[key] is not None:
+            diffs.append(DiffEntry(f"device.{key}", norm_lib[key], None))
+    for key in sorted(swift_keys - lib_keys):
+        if norm_swift[key] is not None:
+            diffs.append(DiffEntry(f"device.{key}", None, norm_swift[key]))
     return diffs
 
 
@@ -608,37 +911,75 @@ def _diff_files(
     swift_files: List[Dict[str, Any]],
     ts_tol: int,
 ) -> List[DiffEntry]:
-    diffs: List[DiffEntry] = []
-    lib_map = {f["path"]: f for f in lib_files}
-    swift_map = {f["path"]: f for f in swift_files}
+    """Merge-join two path-sorted file lists (as _normalise_files returns them).
+
+    Walking both lists in step replaces the per-side path dicts and emits
+    diffs in path order.  When a path repeats, the last entry wins.
+    """
+    # Identical listings (the common case on a healthy device) are confirmed
+    # by one C-level list comparison, which stops at the first mismatch
+    # otherwise.  Equal entries can never exceed a tolerance, which main()
+    # guarantees is non-negative.
+    if lib_files == swift_files:
+        return []
 
-    for path in sorted(set(lib_map) | set(swift_map)):
-        a = lib_map.get(path)
-        b = swift_map.get(path)
-
-        if a is None:
-            diffs.append(DiffEntry(f"file.{path}", None, b))
+    diffs: List[DiffEntry] = []
+    n_lib, n_swift = len(lib_files), len(swift_files)
+    i = j = 0
+
+    while i < n_lib and j < n_swift:
+        a_path, b_path = lib_files[i]["path"], swift_files[j]["path"]
+        # Duplicate paths are rare; only then skip ahead to the run's last entry.
+        if i + 1 < n_lib and lib_files[i + 1]["path"] == a_path:
+            i = _last_of_run(lib_files, i)
+        if j + 1 < n_swift and swift_files[j + 1]["path"] == b_path:
+            j = _last_of_run(swift_files, j)
+        a, b = lib_files[i], swift_files[j]
+
+        if a_path < b_path:
+            diffs.append(DiffEntry(f"file.{a_path}", a, None))
+            i += 1
             continue
-        if b is None:
-            diffs.append(DiffEntry(f"file.{path}", a, None))
+        if b_path < a_path:
+            diffs.append(DiffEntry(f"file.{b_path}", None, b))
+            j += 1
             continue
+        i += 1
+        j += 1
+        if a == b:
+            continue  # one C-level dict compare covers the usual match
 
-        if a.get("size_bytes") != b.get("size_bytes"):
-            diffs.append(
-                DiffEntry(
-                    f"file.{path}.size_bytes",
-                    a.get("size_bytes"),
-                    b.get("size_bytes"),
-                )
-            )
+        a_size, b_size = a.get("size_bytes"), b.get("size_bytes")
+        if a_size != b_size:
+            diffs.append(DiffEntry(f"file.{a_path}.size_bytes", a_size, b_size))
 
         a_mt, b_mt = a.get("mtime"), b.get("mtime")
         if a_mt is not None and b_mt is not None and abs(a_mt - b_mt) > ts_tol:
-            diffs.append(DiffEntry(f"file.{path}.mtime", a_mt, b_mt))
+            diffs.append(DiffEntry(f"file.{a_path}.mtime", a_mt, b_mt))
+
+    while i < n_lib:
+        i = _last_of_run(lib_files, i)
+        a = lib_files[i]
+        diffs.append(DiffEntry(f"file.{a['path']}", a, None))
+        i += 1
+    while j < n_swift:
+        j = _last_of_run(swift_files, j)
+        b = swift_files[j]
+        diffs.append(DiffEntry(f"file.{b['path']}", None, b))
+        j += 1
 
     return diffs
 
 
+def _last_of_run(files: List[Dict[str, Any]], index: int) -> int:
+    """Return the index of the last entry sharing files[index]'s path."""
+    path = files[index]["path"]
+    last = len(files) - 1
+    while index < last and files[index + 1]["path"] == path:
+        index += 1
+    return index
+
+
 # ---------------------------------------------------------------------------
 # Expectation overlay — classification
 # ---------------------------------------------------------------------------
@@ -646,19 +987,48 @@ def _diff_files(
 def _load_expectations(vidpid: Optional[str]) -> Dict[str, Any]:
     if not vidpid:
         return {}
-    # Accept both "18d1:4ee1" and "18d1_4ee1" naming.
-    candidates = [
+    # Accept both "18d1:4ee1" and "18d1_4ee1" naming.  The names are known,
+    # so stat them directly (once each, deduplicated) rather than listing
+    # the directory; the stat result also feeds the cache stamp.
+    candidates = dict.fromkeys((
         _EXPECTATIONS_DIR / f"{vidpid.replace(':', '_')}.yml",
         _EXPECTATIONS_DIR / f"{vidpid}.yml",
-    ]
+    ))
     for path in candidates:
-        if path.exists():
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode):
             _log().info("Loading expectation overlay: %s", path)
-            return _load_yaml(path)
+            return _load_yaml_cached(path, st)
     _log().debug("No expectation overlay found for %s", vidpid)
     return {}
 
 
+def _load_yaml_cached(path: pathlib.Path, st: os.stat_result) -> Dict[str, Any]:
+    """Load *path* (whose stat result is *st*) through an in-process memo.
+
+    Repeated loads of an unchanged overlay within one process return the
+    same parsed dict (callers treat it as read-only); editing the file
+    changes its mtime/size and so misses the memo.
+    """
+    # _EXPECTATIONS_DIR is already absolute, so str(path) is a stable key
+    # without resolve()'s per-component lstat calls.
+    return _load_yaml_stamped(str(path), st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=128)
+def _load_yaml_stamped(path_str: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    # mtime_ns and size only key the memo.
+    return _load_yaml(pathlib.Path(path_str))
+
+
+def _intern_str(value: Any) -> Any:
+    """sys.intern *value* if it is a str; YAML may hand back None or numbers."""
+    return sys.intern(value) if type(value) is str else value
+
+
 def _classify_diffs(
     diffs: List[DiffEntry], expectations: Dict[str, Any]
 ) -> List[DiffEntry]:
@@ -682,7 +1052,9 @@ def _classify_diffs(
             reason = entry.get("reason", "")
             lbl = entry.get("label", implied) or LABEL_UNKNOWN
             if key:
-                result[key] = (lbl, reason)
+                # Interned so YAML-sourced labels are the very objects of the
+                # LABEL_* constants; dict lookups on them hit by identity.
+                result[key] = (_intern_str(lbl), _intern_str(reason))
         return result
 
     intentional = _build_map("intentional_differences")
@@ -693,12 +1065,35 @@ def _classify_diffs(
 
     all_patterns = {**intentional, **quirk, **bugs}
 
+    if not all_patterns:
+        return diffs
+
+    # A pattern matches a key exactly or as a dotted prefix, so the only
+    # candidates for a key are the key itself and its prefixes ending before
+    # each '.'. Look those up directly instead of scanning every pattern;
+    # the rank keeps the first-declared pattern winning when several match.
+    ranked: Dict[str, Tuple[int, str, str]] = {
+        pattern: (rank, lbl, reason)
+        for rank, (pattern, (lbl, reason)) in enumerate(all_patterns.items())
+    }
+
+    # A prefix ending before the n-th dot contains n - 1 dots, so prefixes
+    # deeper than the deepest pattern can never hit; stop the walk there.
+    max_depth = max(pattern.count(".") for pattern in ranked)
+
     for diff in diffs:
-        for pattern, (lbl, reason) in all_patterns.items():
-            if diff.key == pattern or diff.key.startswith(pattern + "."):
-                diff.label = lbl
-                diff.reason = reason
-                break
+        key = diff.key
+        best = ranked.get(key)
+        dot = key.find(".")
+        depth = 0
+        while dot >= 0 and depth <= max_depth:
+            hit = ranked.get(key[:dot])
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+            dot = key.find(".", dot + 1)
+            depth += 1
+        if best is not None:
+            _, diff.label, diff.reason = best
         # If still UNKNOWN, leave it — no else branch needed.
 
     return diffs
@@ -713,6 +1108,8 @@ def _run_write_tests(
     swiftmtp: SwiftMTPRunner,
 ) -> Dict[str, Any]:
     """Upload a small sentinel file via both toolchains; return results dict."""
+    import tempfile  # write tests are opt-in (--allow-write)
+
     results: Dict[str, Any] = {}
     content = (
         "SwiftMTP compat-harness write-test sentinel\n"
@@ -764,17 +1161,87 @@ def _make_run_dir(
     return run_dir
 
 
-def _write_json(path: pathlib.Path, data: Any) -> None:
-    path.write_text(json.dumps(data, indent=2, default=str), encoding="utf-8")
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _write_bytes(path: pathlib.Path, data: bytes) -> None:
+    """Write a whole file with raw os.write calls.
+
+    Evidence files are produced in one piece, so the buffered file object
+    that Path.write_bytes/write_text sets up (and its extra fstat/lseek/
+    ioctl syscalls) buys nothing here.
+    """
+    fd = os.open(path, _WRITE_FLAGS, 0o666)
+    try:
+        _write_all(fd, data)
+    finally:
+        os.close(fd)
+
+
+# A log section body: text captured in memory, or a spooled binary file.
+LogSection = Tuple[str, Union[str, BinaryIO]]
+
+
+def _write_log(path: pathlib.Path, sections: List[LogSection]) -> None:
+    """Write "=== title ===" delimited *sections* to *path*.
+
+    Written with raw os.write calls like _write_bytes; spooled sections are
+    copied across in chunks rather than read back into a Python string.
+    """
+    fd = os.open(path, _WRITE_FLAGS, 0o666)
+    try:
+        for title, body in sections:
+            _write_all(fd, f"\n=== {title} ===\n".encode("utf-8"))
+            if isinstance(body, str):
+                _write_all(fd, body.encode("utf-8"))
+            else:
+                body.seek(0)
+                for chunk in iter(functools.partial(body.read, 1 << 16), b""):
+                    _write_all(fd, chunk)
+    finally:
+        os.close(fd)
+
+
+def _json_default(obj: Any) -> Any:
+    """Serialise DiffEntry rows one at a time as they are written; str() the rest."""
+    if isinstance(obj, DiffEntry):
+        return obj.to_dict()
+    return str(obj)
+
+
+_LABEL_OF = operator.attrgetter("label")
 
 
 def _summary_counts(diffs: List[DiffEntry]) -> Dict[str, int]:
     counts: Dict[str, int] = {lbl: 0 for lbl in _ALL_LABELS}
-    for d in diffs:
-        counts[d.label] = counts.get(d.label, 0) + 1
+    counts.update(collections.Counter(map(_LABEL_OF, diffs)))
     return counts
 
 
+_DIFF_KEY = operator.attrgetter("key")
+
+
+def _md_cell(v: Any) -> str:
+    """Render a diff value for a markdown table cell (JSON text, max 120 chars)."""
+    if isinstance(v, str):
+        s = v
+    elif v is None:
+        return "null"
+    elif v is True or v is False:
+        return "true" if v else "false"
+    elif type(v) is int:
+        s = str(v)  # same text as json.dumps for plain ints, without the call
+    else:
+        s = json.dumps(v)
+    return s.replace("|", "\\|")[:120]
+
+
 def _write_diff_md(
     path: pathlib.Path,
     meta: Dict[str, Any],
@@ -808,15 +1275,13 @@ def _write_diff_md(
             "|-----|-------------|----------------|-------|--------|",
         ]
 
-        def _cell(v: Any) -> str:
-            s = json.dumps(v) if not isinstance(v, str) else v
-            return s.replace("|", "\\|")[:120]
-
-        for d in sorted(diffs, key=lambda x: x.key):
-            lines.append(
-                f"| `{d.key}` | {_cell(d.libmtp_val)} | {_cell(d.swiftmtp_val)}"
-                f" | `{d.label}` | {d.reason} |"
-            )
+        # Diffs arrive in path order, which is not key order once suffixes
+        # like ".size_bytes" are appended, so this sort stays.
+        lines.extend(
+            f"| `{d.key}` | {_md_cell(d.libmtp_val)} | {_md_cell(d.swiftmtp_val)}"
+            f" | `{d.label}` | {d.reason} |"
+            for d in sorted(diffs, key=_DIFF_KEY)
+        )
         lines.append("")
 
     if write_results:
@@ -829,8 +1294,9 @@ def _write_diff_md(
     lines += [
         "---",
         f"*Generated by compat-harness.py — SwiftMTP project*",
+        "",  # trailing newline from the join, not a second full-text copy
     ]
-    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    _write_bytes(path, "\n".join(lines).encode("utf-8"))
 
 
 def _write_evidence(
@@ -841,16 +1307,20 @@ def _write_evidence(
     swiftmtp_raw: Dict[str, Any],
     diffs: List[DiffEntry],
     write_results: Optional[Dict[str, Any]],
-    swiftmtp_log: str,
-    libmtp_log: str,
+    swiftmtp_log: List[LogSection],
+    libmtp_log: List[LogSection],
 ) -> None:
     _write_json(run_dir / "meta.json", meta)
-    _write_json(run_dir / "libmtp.json", libmtp_raw)
-    _write_json(run_dir / "swiftmtp.json", swiftmtp_raw)
+    # The raw tool dumps hold every file entry and are only machine-read;
+    # write them compact. meta.json and diff.json stay indented for review.
+    _write_json(run_dir / "libmtp.json", libmtp_raw, indent=None)
+    _write_json(run_dir / "swiftmtp.json", swiftmtp_raw, indent=None)
 
     diff_payload: Dict[str, Any] = {
         "run_id": meta["run_id"],
-        "diffs": [d.to_dict() for d in diffs],
+        # DiffEntry rows are converted by _json_default while writing rather
+        # than copied into a second list of dicts here.
+        "diffs": diffs,
         "summary": {
             "total_diffs": len(diffs),
             "by_label": _summary_counts(diffs),
@@ -862,91 +1332,119 @@ def _write_evidence(
 
     _write_diff_md(run_dir / "diff.md", meta, diffs, write_results)
 
-    (run_dir / "logs" / "swiftmtp.log").write_text(swiftmtp_log, encoding="utf-8")
-    (run_dir / "logs" / "libmtp.log").write_text(libmtp_log, encoding="utf-8")
+    _write_log(run_dir / "logs" / "swiftmtp.log", swiftmtp_log)
+    _write_log(run_dir / "logs" / "libmtp.log", libmtp_log)
 
 
 # ---------------------------------------------------------------------------
 # stdout progress helpers
 # ---------------------------------------------------------------------------
 
-def _banner() -> None:
-    print("=" * 68)
-    print("  SwiftMTP ↔ libmtp Compatibility Harness")
-    print("=" * 68)
+def _banner() -> List[str]:
+    return [
+        "=" * 68,
+        "  SwiftMTP ↔ libmtp Compatibility Harness",
+        "=" * 68,
+    ]
+
+
+# Progress lines are plain text on stdout; one write each instead of
+# print()'s separate writes for the text and the newline.  A line that
+# announces a step goes out before the step starts; only lines printed
+# back to back (banner, tool checks, summary) are batched with _emit.
+
+def _emit(lines: List[str]) -> None:
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def _progress(msg: str) -> None:
-    print(f"  ▶  {msg}")
+    sys.stdout.write(f"  ▶  {msg}\n")
 
 
-def _result(label: str, ok: bool, extra: str = "") -> None:
+def _result_line(label: str, ok: bool, extra: str = "") -> str:
     icon = "✓" if ok else "✗"
     suffix = f"  ({extra})" if extra else ""
-    print(f"  {icon}  {label}{suffix}")
+    return f"  {icon}  {label}{suffix}"
+
+
+def _result(label: str, ok: bool, extra: str = "") -> None:
+    sys.stdout.write(_result_line(label, ok, extra) + "\n")
 
 
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
+# Help text, written flush-left so it needs no dedent at parser build time.
+_DESCRIPTION = """\
+SwiftMTP ↔ libmtp compatibility harness.
+
+Runs both toolchains against a connected MTP device, normalises
+their output, diffs the results (with configurable timestamp
+tolerance), optionally classifies diffs using a per-device
+expectation overlay, and writes structured evidence to disk.
+"""
+
+_EPILOG = """\
+Expectation overlays
+--------------------
+  compat/expectations/<vid>_<pid>.yml  (e.g. 18d1_4ee1.yml)
+  See compat/expectations/README.md for the full format.
+
+Evidence output
+---------------
+  evidence/<date>/<vidpid>/<run-id>/
+    meta.json, swiftmtp.json, libmtp.json
+    diff.json, diff.md
+    logs/swiftmtp.log, logs/libmtp.log
+
+Diff labels
+-----------
+  bug_swiftmtp  SwiftMTP returns wrong data
+  bug_libmtp    libmtp returns wrong data
+  intentional   documented difference (e.g. privacy redaction)
+  quirk_needed  SwiftMTP needs a device-quirk entry
+  unknown       unclassified — needs investigation
+
+Examples
+--------
+  # Read-only, auto-detect device:
+  ./scripts/compat-harness.py
+
+  # Target a specific device:
+  ./scripts/compat-harness.py --vidpid 18d1:4ee1
+
+  # Controlled write tests:
+  ./scripts/compat-harness.py --vidpid 04e8:6860 --allow-write
+
+  # Custom evidence root + verbose logging:
+  ./scripts/compat-harness.py --evidence-dir /tmp/compat -v
+
+Exit codes
+----------
+  0  No unresolved diffs (unknown or bug_swiftmtp count is zero)
+  1  Unresolved diffs present — investigation required
+  2  Argument or configuration error
+"""
+
+
+def _non_negative_int(text: str) -> int:
+    """argparse type for tolerances: a negative window has no meaning."""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {text!r}") from None
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must be >= 0, got {value}")
+    return value
+
+
 def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="compat-harness.py",
-        description=textwrap.dedent(
-            """\
-            SwiftMTP ↔ libmtp compatibility harness.
-
-            Runs both toolchains against a connected MTP device, normalises
-            their output, diffs the results (with configurable timestamp
-            tolerance), optionally classifies diffs using a per-device
-            expectation overlay, and writes structured evidence to disk.
-            """
-        ),
+        description=_DESCRIPTION,
         formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog=textwrap.dedent(
-            f"""\
-            Expectation overlays
-            --------------------
-              compat/expectations/<vid>_<pid>.yml  (e.g. 18d1_4ee1.yml)
-              See compat/expectations/README.md for the full format.
-
-            Evidence output
-            ---------------
-              evidence/<date>/<vidpid>/<run-id>/
-                meta.json, swiftmtp.json, libmtp.json
-                diff.json, diff.md
-                logs/swiftmtp.log, logs/libmtp.log
-
-            Diff labels
-            -----------
-              bug_swiftmtp  SwiftMTP returns wrong data
-              bug_libmtp    libmtp returns wrong data
-              intentional   documented difference (e.g. privacy redaction)
-              quirk_needed  SwiftMTP needs a device-quirk entry
-              unknown       unclassified — needs investigation
-
-            Examples
-            --------
-              # Read-only, auto-detect device:
-              ./scripts/compat-harness.py
-
-              # Target a specific device:
-              ./scripts/compat-harness.py --vidpid 18d1:4ee1
-
-              # Controlled write tests:
-              ./scripts/compat-harness.py --vidpid 04e8:6860 --allow-write
-
-              # Custom evidence root + verbose logging:
-              ./scripts/compat-harness.py --evidence-dir /tmp/compat -v
-
-            Exit codes
-            ----------
-              0  No unresolved diffs (unknown or bug_swiftmtp count is zero)
-              1  Unresolved diffs present — investigation required
-              2  Argument or configuration error
-            """
-        ),
+        epilog=_EPILOG,
     )
 
     parser.add_argument(
@@ -985,7 +1483,7 @@ def _build_parser() -> argparse.ArgumentParser:
     )
     parser.add_argument(
         "--ts-tolerance",
-        type=int,
+        type=_non_negative_int,
         default=120,
         metavar="SECS",
         help="Acceptable mtime difference in seconds before a file timestamp "
@@ -1014,7 +1512,9 @@ def main(argv: Optional[List[str]] = None) -> int:
 
     evidence_root = pathlib.Path(args.evidence_dir)
     swiftmtpkit_dir = pathlib.Path(args.swiftmtpkit_dir)
-    run_id = str(uuid.uuid4())[:8]
+    # Eight random hex digits: the same as the leading group of a uuid4
+    # (its version bits come later), without importing uuid for it.
+    run_id = os.urandom(4).hex()
 
     # Validate SwiftMTPKit directory
     if not swiftmtpkit_dir.is_dir():
@@ -1023,26 +1523,37 @@ def main(argv: Optional[List[str]] = None) -> int:
     # ------------------------------------------------------------------
     # Banner
     # ------------------------------------------------------------------
-    _banner()
-    print(f"  Run ID     : {run_id}")
-    print(f"  Device     : {args.vidpid or '(auto-detect first found)'}")
-    print(f"  Write tests: {'enabled' if args.allow_write else 'disabled'}")
-    print(f"  Evidence   : {evidence_root}")
-    print()
+    _emit([
+        *_banner(),
+        f"  Run ID     : {run_id}",
+        f"  Device     : {args.vidpid or '(auto-detect first found)'}",
+        f"  Write tests: {'enabled' if args.allow_write else 'disabled'}",
+        f"  Evidence   : {evidence_root}",
+        "",
+    ])
 
     # ------------------------------------------------------------------
     # Tool availability
     # ------------------------------------------------------------------
+    # Helper work that never touches the device (version queries, the
+    # expectation overlay) runs on a small pool so it overlaps with the
+    # probes below.  The probes themselves stay serial: libmtp and SwiftMTP
+    # each claim the device's USB interface.
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    expectations_future = pool.submit(_load_expectations, args.vidpid)
+
     _progress("Checking tool availability …")
     swift_ok = _check_tool("swift")
     mtp_detect_ok = _check_tool("mtp-detect")
     mtp_folders_ok = _check_tool("mtp-folders")
     mtp_files_ok = _check_tool("mtp-files")
 
-    _result("swift", swift_ok)
-    _result("mtp-detect", mtp_detect_ok)
-    _result("mtp-folders", mtp_folders_ok)
-    _result("mtp-files", mtp_files_ok)
+    _emit([
+        _result_line("swift", swift_ok),
+        _result_line("mtp-detect", mtp_detect_ok),
+        _result_line("mtp-folders", mtp_folders_ok),
+        _result_line("mtp-files", mtp_files_ok),
+    ])
 
     if not swift_ok:
         _log().warning("swift not found — SwiftMTP results will be empty.")
@@ -1053,14 +1564,30 @@ def main(argv: Optional[List[str]] = None) -> int:
     # ------------------------------------------------------------------
     # Collect tool version metadata
     # ------------------------------------------------------------------
-    tool_versions = {
-        "swift": _tool_version("swift") if swift_ok else None,
-        "mtp-detect": _tool_version("mtp-detect") if mtp_detect_ok else None,
-    }
+    # Only `swift --version` runs in the background.  mtp-detect has no
+    # version flag, so querying it runs a full detect that opens the device;
+    # it is done serially once the probes below are finished.
+    swift_version_future = pool.submit(_cached_tool_version, "swift") if swift_ok else None
 
     # ------------------------------------------------------------------
-    # libmtp side
+    # libmtp side (swiftmtp compiles meanwhile)
     # ------------------------------------------------------------------
+    swiftmtp = SwiftMTPRunner(
+        vidpid=args.vidpid,
+        swiftmtpkit_dir=swiftmtpkit_dir,
+        timeout=args.timeout + 60,  # allow for incremental swift build
+    )
+    # Building is CPU-bound and never opens the device, so it overlaps the
+    # libmtp reads below; the device itself is still used by one side at
+    # a time.
+    build_log: Union[str, BinaryIO] = ""
+    build_future = None
+    if swift_ok:
+        import tempfile
+
+        build_log = tempfile.TemporaryFile()
+        build_future = pool.submit(swiftmtp.build, build_log)
+
     libmtp = LibmtpRunner(vidpid=args.vidpid, timeout=args.timeout)
 
     _progress("Running mtp-detect …")
@@ -1076,26 +1603,26 @@ def main(argv: Optional[List[str]] = None) -> int:
     libmtp_files, libmtp_files_log = libmtp.files()
     _result("mtp-files", True, f"{len(libmtp_files)} file(s)")
 
-    libmtp_log = (
-        "\n=== mtp-detect ===\n"
-        + libmtp_detect_log
-        + "\n=== mtp-folders ===\n"
-        + libmtp_folders_log
-        + "\n=== mtp-files ===\n"
-        + libmtp_files_log
-    )
+    # Sections are written to the log one after another at the end; no
+    # combined copy of them is ever built in memory.
+    libmtp_log: List[LogSection] = [
+        ("mtp-detect", libmtp_detect_log),
+        ("mtp-folders", libmtp_folders_log),
+        ("mtp-files", libmtp_files_log),
+    ]
     print()
 
     # ------------------------------------------------------------------
     # SwiftMTP side
     # ------------------------------------------------------------------
-    swiftmtp = SwiftMTPRunner(
-        vidpid=args.vidpid,
-        swiftmtpkit_dir=swiftmtpkit_dir,
-        timeout=args.timeout + 60,  # allow for incremental swift build
-    )
-
-    _progress("Running swiftmtp probe --json (first run may trigger build) …")
+    if build_future is not None:
+        _progress("Waiting for swiftmtp build …")
+        build_ok = build_future.result()
+        # A failed build is not fatal here: `swift run` below retries it and
+        # its error lands in the probe result.
+        _result("swift build", build_ok)
+
+    _progress("Running swiftmtp probe --json …")
     swiftmtp_probe, swiftmtp_probe_log = swiftmtp.probe()
     _result("swiftmtp probe", "error" not in swiftmtp_probe)
 
@@ -1104,12 +1631,11 @@ def main(argv: Optional[List[str]] = None) -> int:
     ls_count = len(swiftmtp_ls) if isinstance(swiftmtp_ls, list) else "?"
     _result("swiftmtp ls", not isinstance(swiftmtp_ls, dict) or "error" not in swiftmtp_ls, f"{ls_count} item(s)")
 
-    swiftmtp_log = (
-        "\n=== swiftmtp probe ===\n"
-        + swiftmtp_probe_log
-        + "\n=== swiftmtp ls ===\n"
-        + swiftmtp_ls_log
-    )
+    swiftmtp_log: List[LogSection] = [
+        ("swift build", build_log),
+        ("swiftmtp probe", swiftmtp_probe_log),
+        ("swiftmtp ls", swiftmtp_ls_log),
+    ]
     print()
 
     # ------------------------------------------------------------------
@@ -1121,15 +1647,29 @@ def main(argv: Optional[List[str]] = None) -> int:
         write_results = _run_write_tests(libmtp, swiftmtp)
         print()
 
+    tool_versions = {
+        "swift": swift_version_future.result() if swift_version_future is not None else None,
+        # Serial: the device is idle now that every probe has finished.
+        "mtp-detect": _cached_tool_version("mtp-detect") if mtp_detect_ok else None,
+    }
+
     # ------------------------------------------------------------------
     # Load expectation overlay
     # ------------------------------------------------------------------
-    expectations = _load_expectations(args.vidpid)
+    expectations = expectations_future.result()
+    pool.shutdown()
     ts_tol = args.ts_tolerance
     overlay_tol = expectations.get("tolerances", {}).get("timestamp_seconds")
     if overlay_tol is not None:
-        ts_tol = int(overlay_tol)
-        _log().info("Timestamp tolerance overridden by overlay: %ds", ts_tol)
+        if int(overlay_tol) < 0:
+            _log().warning(
+                "Ignoring negative overlay timestamp tolerance (%s); using %ds",
+                overlay_tol,
+                ts_tol,
+            )
+        else:
+            ts_tol = int(overlay_tol)
+            _log().info("Timestamp tolerance overridden by overlay: %ds", ts_tol)
 
     # ------------------------------------------------------------------
     # Normalise
@@ -1191,27 +1731,34 @@ def main(argv: Optional[List[str]] = None) -> int:
         swiftmtp_log=swiftmtp_log,
         libmtp_log=libmtp_log,
     )
-    print()
+    if not isinstance(build_log, str):
+        build_log.close()
 
     # ------------------------------------------------------------------
     # Summary
     # ------------------------------------------------------------------
     counts = _summary_counts(diffs)
-    print("=" * 68)
-    print("  Results")
-    print("=" * 68)
-    print(f"  Total diffs      : {len(diffs)}")
+    summary = [
+        "",
+        "=" * 68,
+        "  Results",
+        "=" * 68,
+        f"  Total diffs      : {len(diffs)}",
+    ]
     for lbl in _ALL_LABELS:
         n = counts.get(lbl, 0)
         if n:
-            print(f"    {lbl:<20}: {n}")
+            summary.append(f"    {lbl:<20}: {n}")
     if write_results:
         all_passed = all(v.get("success") for v in write_results.values())
-        print(f"  Write tests      : {'PASS' if all_passed else 'FAIL'}")
-    print()
-    print(f"  Evidence dir     : {run_dir}")
-    print(f"  Diff report      : {run_dir / 'diff.md'}")
-    print()
+        summary.append(f"  Write tests      : {'PASS' if all_passed else 'FAIL'}")
+    summary += [
+        "",
+        f"  Evidence dir     : {run_dir}",
+        f"  Diff report      : {run_dir / 'diff.md'}",
+        "",
+    ]
+    _emit(summary)
 
     # Exit non-zero when there are unresolved diffs that need investigation.
     unresolved = counts.get(LABEL_UNKNOWN, 0) + counts.get(LABEL_BUG_SWIFTMTP, 0)
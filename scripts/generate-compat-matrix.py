@@ -1,37 +1,72 @@
 #!/usr/bin/env python3
 """Regenerate Docs/compat-matrix.md from Specs/quirks.json."""
 import json
+from collections import defaultdict
+from operator import itemgetter
+from pathlib import Path
 
-with open("Specs/quirks.json") as f:
-    d = json.load(f)
+# Optional orjson support. quirks.json holds tens of thousands of entries and
+# decoding it dominates the run; orjson parses it several times faster than
+# stdlib json. Fall back to stdlib json when it is not installed.
+try:
+    import orjson as _orjson_mod
 
-entries = d["entries"]
-by_category = {}
-for e in entries:
-    cat = e.get("category", "unknown")
-    by_category.setdefault(cat, []).append(e)
+    def _load_json(path):
+        return _orjson_mod.loads(path.read_bytes())
+
+except ImportError:
+    _orjson_mod = None  # type: ignore[assignment]
+
+    def _load_json(path):  # type: ignore[misc]
+        return json.loads(path.read_bytes())
+
+
+_SORT_KEY = itemgetter(0)
 
+
+d = _load_json(Path("Specs/quirks.json"))
+
+entries = d["entries"]
+# One pass groups entries by category and collects vendor IDs together.
+by_category = defaultdict(list)
 vids = set()
 for e in entries:
+    by_category[e.get("category", "unknown")].append(e)
     vids.add(e["match"]["vid"])
 
+# Build the whole document first and write it once; per-row f.write() calls
+# add up across tens of thousands of entries.
+parts = [
+    "# Compatibility Matrix\n\n",
+    "Auto-generated from Specs/quirks.json — do not edit manually.\n\n",
+    f"**{len(entries):,}** device entries across **{len(vids)}** vendor IDs and **{len(by_category)}** categories.\n\n",
+]
+
+for cat in sorted(by_category.keys()):
+    cat_entries = by_category[cat]
+    parts.append(f"## {cat.replace('-', ' ').title()} ({len(cat_entries)})\n\n")
+    parts.append("| Device | VID:PID | Status | Confidence |\n")
+    parts.append("|--------|---------|--------|------------|\n")
+    # Decorate each row with its sort key while the device name is already
+    # in hand: entries without a deviceName sort as "" but display their id.
+    rows = []
+    for e in cat_entries:
+        if "deviceName" in e:
+            key = name = e["deviceName"]
+        else:
+            key, name = "", e["id"]
+        match = e["match"]
+        rows.append((
+            key,
+            f"| {name} | {match['vid']}:{match['pid']} "
+            f"| {e.get('status', 'unknown')} | {e.get('confidence', 'unknown')} |",
+        ))
+    rows.sort(key=_SORT_KEY)  # stable, like sorted() on the entries
+    # One join per category instead of one append per row.
+    parts.append("\n".join([row for _, row in rows]))
+    parts.append("\n\n")
+
 with open("Docs/compat-matrix.md", "w") as f:
-    f.write("# Compatibility Matrix\n\n")
-    f.write("Auto-generated from Specs/quirks.json — do not edit manually.\n\n")
-    f.write(f"**{len(entries):,}** device entries across **{len(vids)}** vendor IDs and **{len(by_category)}** categories.\n\n")
-
-    for cat in sorted(by_category.keys()):
-        cat_entries = by_category[cat]
-        f.write(f"## {cat.replace('-', ' ').title()} ({len(cat_entries)})\n\n")
-        f.write("| Device | VID:PID | Status | Confidence |\n")
-        f.write("|--------|---------|--------|------------|\n")
-        for e in sorted(cat_entries, key=lambda x: x.get("deviceName", "")):
-            name = e.get("deviceName", e["id"])
-            vid = e["match"]["vid"]
-            pid = e["match"]["pid"]
-            status = e.get("status", "unknown")
-            confidence = e.get("confidence", "unknown")
-            f.write(f"| {name} | {vid}:{pid} | {status} | {confidence} |\n")
-        f.write("\n")
+    f.write("".join(parts))
 
 print(f"Generated compat-matrix.md: {len(entries)} entries, {len(vids)} VIDs, {len(by_category)} categories")